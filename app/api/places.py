@@ -1,8 +1,10 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel import select, Session
+from ..core.catalog import bump_catalog_version
 from ..db import get_session
 from ..models import Place, PlaceRead
+from ..services.spatial import MAX_ZOOM, cell_deg, grid_index, CELLS_PER_TILE_LOG2
 
 router = APIRouter()
 
@@ -10,6 +12,7 @@ router = APIRouter()
 def add_place(place: Place, session: Session = Depends(get_session)):
     session.add(place)
     session.commit()
+    bump_catalog_version()
     session.refresh(place)
     return place
 
@@ -31,6 +34,30 @@ def search_places(q: str = Query(..., min_length=2), city: Optional[str] = None,
     q_lower = q.lower()
     return [p for p in results if q_lower in p.name.lower() or q_lower in p.description.lower() or q_lower in p.category.lower()]
 
+@router.get("/clusters")
+def place_clusters(
+    zoom: int = Query(3, ge=0, le=22),
+    bbox: Optional[str] = Query(None, description="min_lng,min_lat,max_lng,max_lat"),
+    category: Optional[str] = None,
+    session: Session = Depends(get_session),
+):
+    box = None
+    if bbox:
+        try:
+            box = tuple(float(v) for v in bbox.split(","))
+        except ValueError:
+            box = ()
+        # min_lng > max_lng is a box crossing the antimeridian
+        if len(box) != 4 or box[1] > box[3]:
+            raise HTTPException(422, "bbox must be min_lng,min_lat,max_lng,max_lat")
+    clusters = grid_index(session).clusters(zoom, box, category)
+    return {
+        "zoom": zoom,
+        "cell_deg": cell_deg(min(zoom, MAX_ZOOM) + CELLS_PER_TILE_LOG2),
+        "total": sum(c["count"] for c in clusters),
+        "clusters": clusters,
+    }
+
 @router.get("/{place_id}", response_model=PlaceRead)
 def get_place(place_id: int, session: Session = Depends(get_session)):
     place = session.get(Place, place_id)
@@ -1,11 +1,15 @@
 from datetime import date, time
 from typing import List, Optional, Dict
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel, Field, field_validator
 from sqlmodel import Session
-from ..db import get_session
-from ..models import Trip, ItineraryItem, ItineraryItemRead, TripRead
-from ..services.planner import PlanParams, generate_plan
+from ..core.config import settings
+from ..core.deadline import deadline
+from ..db import engine, get_session
+from ..models import Trip, ItineraryItem, ItineraryItemBase, ItineraryItemRead, TripRead
+from ..services.jobs import JobQueue, QueueFull, job_view
+from ..services.planner import MAX_ALTERNATIVES, PlanParams, generate_plans
 
 router = APIRouter()
 
@@ -25,6 +29,9 @@ class PlanRequest(BaseModel):
     dry_run: bool = True
     use_google: bool = False
     country_mode: bool = False
+    weather_aware: bool = True
+    alternatives: int = Field(default=1, ge=1, le=MAX_ALTERNATIVES)
+    deadline_s: Optional[float] = Field(default=None, gt=0)  # tightens PLAN_DEADLINE_S; bounds background jobs
 
     @field_validator("end_date")
     @classmethod
@@ -33,63 +40,112 @@ class PlanRequest(BaseModel):
             raise ValueError("end_date must be on/after start_date")
         return v
 
-@router.post("/generate")
-def plan_generate(req: PlanRequest, session: Session = Depends(get_session)):
-    try:
-        params = PlanParams(
-            destination=req.destination,
-            start_date=req.start_date,
-            end_date=req.end_date,
-            interests=req.interests,
-            daily_start=req.daily_start,
-            daily_end=req.daily_end,
-            lunch_at=req.lunch_at,
-            pace=req.pace,
-            budget_level=req.budget_level,
-            origin=req.origin,
-            name=req.name or f"{req.destination} Trip",
-            use_google=req.use_google,
-            country_mode=req.country_mode,
+    @field_validator("alternatives")
+    @classmethod
+    def check_alternatives(cls, v, info):
+        if v > 1 and not info.data.get("dry_run", True):
+            raise ValueError("alternatives are previews; pick one and save it with dry_run=false")
+        return v
+
+    def to_params(self) -> PlanParams:
+        return PlanParams(
+            destination=self.destination,
+            start_date=self.start_date,
+            end_date=self.end_date,
+            interests=self.interests,
+            daily_start=self.daily_start,
+            daily_end=self.daily_end,
+            lunch_at=self.lunch_at,
+            pace=self.pace,
+            budget_level=self.budget_level,
+            origin=self.origin,
+            name=self.name or f"{self.destination} Trip",
+            use_google=self.use_google,
+            country_mode=self.country_mode,
+            weather_aware=self.weather_aware,
         )
-        schedule = generate_plan(session, params)
-    except ValueError as e:
-        raise HTTPException(400, str(e))
-    except Exception as e:
-        raise HTTPException(500, f"Internal server error: {str(e)}")
 
+def _preview(req: PlanRequest, schedule: Dict[str, List[ItineraryItemBase]]) -> Dict:
+    # Planned items are unsaved (trip_id 0, no id); dump them as they are
+    days = {day: [i.model_dump() | {"id": 0} for i in items] for day, items in schedule.items()}
+    return {"destination": req.destination, "days": days}
+
+def _plan_result(session: Session, req: PlanRequest, params: PlanParams, schedules: List[Dict[str, List[ItineraryItemBase]]]) -> Dict:
+    """Preview body for dry runs; otherwise save the trip and its items in one transaction"""
+    schedule = schedules[0]
     if req.dry_run:
-        preview_days = {}
-        for day, items in schedule.items():
-            preview_days[day] = [
-                ItineraryItem(
-                    trip_id=0,
-                    day=i.day, title=i.title, type=i.type, location_name=i.location_name,
-                    lat=i.lat, lng=i.lng, start_time=i.start_time, end_time=i.end_time, notes=i.notes
-                ).model_dump() | {"id": 0} for i in items
-            ]
-        return {"preview": {"destination": req.destination, "days": preview_days}}
+        out = {"preview": _preview(req, schedule)}
+        if req.alternatives > 1:
+            # The first alternative is the preview itself
+            out["alternatives"] = [out["preview"]] + [_preview(req, s) for s in schedules[1:]]
+        return out
 
     trip = Trip(
         name=params.name, origin=params.origin, destination=params.destination,
         start_date=params.start_date, end_date=params.end_date, travelers=req.travelers
     )
     session.add(trip)
-    session.commit()
-    session.refresh(trip)
+    session.flush()
 
-    out_items = []
-    for day, items in schedule.items():
-        for i in items:
-            itm = ItineraryItem(
-                trip_id=trip.id, day=i.day, title=i.title, type=i.type, location_name=i.location_name,
-                lat=i.lat, lng=i.lng, start_time=i.start_time, end_time=i.end_time, notes=i.notes
-            )
-            session.add(itm)
-            session.commit()
-            session.refresh(itm)
-            out_items.append(itm)
+    out_items = [
+        ItineraryItem(
+            trip_id=trip.id, day=i.day, title=i.title, type=i.type, location_name=i.location_name,
+            lat=i.lat, lng=i.lng, start_time=i.start_time, end_time=i.end_time, notes=i.notes
+        )
+        for items in schedule.values() for i in items
+    ]
+    session.add_all(out_items)
+    session.commit()
 
     return {
         "trip": TripRead(**trip.model_dump()),
         "items": [ItineraryItemRead(**i.model_dump()) for i in out_items]
     }
+
+@router.post("/generate")
+def plan_generate(req: PlanRequest, response: Response, session: Session = Depends(get_session)):
+    """Plan within PLAN_DEADLINE_S; external data that does not arrive in time is left out
+    and named in the X-Plan-Degraded header (places, hubs, weather)"""
+    try:
+        params = req.to_params()
+        with deadline(min(req.deadline_s or settings.plan_deadline_s, settings.plan_deadline_s)) as budget:
+            schedules = generate_plans(session, params, req.alternatives)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except Exception as e:
+        raise HTTPException(500, f"Internal server error: {str(e)}")
+    if budget.degraded:
+        response.headers["X-Plan-Degraded"] = ",".join(budget.degraded)
+    return _plan_result(session, req, params, schedules)
+
+def _run_plan_job(request: Dict, progress) -> Dict:
+    req = PlanRequest.model_validate(request)
+    params = req.to_params()
+    with Session(engine, expire_on_commit=False) as session, deadline(req.deadline_s):
+        schedules = generate_plans(session, params, req.alternatives, progress)
+        progress(80, "saving" if not req.dry_run else "formatting")
+        return jsonable_encoder(_plan_result(session, req, params, schedules))
+
+plan_jobs = JobQueue(
+    _run_plan_job,
+    workers=settings.plan_job_workers,
+    max_pending=settings.plan_job_max_pending,
+    stale_s=settings.plan_job_stale_s,
+    max_attempts=settings.plan_job_max_attempts,
+)
+
+@router.post("/jobs", status_code=202)
+def plan_job_submit(req: PlanRequest):
+    """Queue a plan; poll GET /plan/jobs/{job_id} for progress and the /plan/generate result"""
+    try:
+        job = plan_jobs.submit(req.model_dump(mode="json"))
+    except QueueFull as e:
+        raise HTTPException(503, str(e), headers={"Retry-After": "30"})
+    return job_view(job)
+
+@router.get("/jobs/{job_id}")
+def plan_job_status(job_id: int):
+    job = plan_jobs.get(job_id)
+    if not job:
+        raise HTTPException(404, "Job not found")
+    return job_view(job)
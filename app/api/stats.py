@@ -0,0 +1,38 @@
+from typing import Dict
+from fastapi import APIRouter, Depends
+from sqlalchemy import func
+from sqlmodel import select, Session
+from ..core.cache import TTLCache
+from ..core.catalog import catalog_version
+from ..db import get_session
+from ..models import Place, Trip
+
+router = APIRouter()
+
+# Keyed by catalog version; the TTL only bounds how long an old version lingers
+_catalog_stats = TTLCache(ttl=3600, maxsize=4)
+
+def _place_aggregates(session: Session) -> Dict:
+    rows = session.exec(
+        select(Place.city, Place.category, func.count(Place.id)).group_by(Place.city, Place.category)
+    ).all()
+    by_category: Dict[str, int] = {}
+    by_city: Dict[str, Dict] = {}
+    total = 0
+    for city, category, n in rows:
+        total += n
+        by_category[category] = by_category.get(category, 0) + n
+        entry = by_city.setdefault(city, {"places": 0, "categories": {}})
+        entry["places"] += n
+        entry["categories"][category] = n
+    return {"places": total, "cities": len(by_city), "by_category": by_category, "by_city": by_city}
+
+@router.get("")
+def get_stats(session: Session = Depends(get_session)):
+    version = catalog_version()
+    places = _catalog_stats.get(version)
+    if places is None:
+        places = _place_aggregates(session)
+        _catalog_stats.set(version, places)
+    trips = session.exec(select(func.count(Trip.id))).one()
+    return {"trips": trips, **places, "catalog_version": version}
@@ -1,11 +1,62 @@
-from typing import List, Dict
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date, time
+from typing import List, Dict, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from sqlalchemy import delete, func
 from sqlmodel import select, Session
 from ..db import get_session
-from ..models import Trip, TripRead, TripUpdate, ItineraryItem, ItineraryItemRead, ItineraryItemUpdate
+from ..models import Trip, TripRead, TripSummary, TripSummaryRead, TripUpdate, ItineraryItem, ItineraryItemRead, ItineraryItemUpdate
+from ..services.planner import PlanParams, replan_day
+from ..services.timeline import clock, minutes
 
 router = APIRouter()
 
+class ReplanRequest(BaseModel):
+    daily_start: time = time(9,0)
+    daily_end: time = time(19,0)
+    lunch_at: Optional[time] = time(13,0)
+    pace: str = Field(default="standard", pattern=r"^(relaxed|standard|packed)$")
+    backfill: bool = False
+    interests: List[str] = Field(default_factory=lambda: ["sights","museum","food","nature","shopping"])
+    budget_level: Optional[int] = Field(default=None, ge=0, le=4)
+
+class BulkItemCreate(ItineraryItemUpdate):
+    title: str
+
+class BulkItemUpdate(ItineraryItemUpdate):
+    id: int
+
+class ItemReorder(BaseModel):
+    """Move items to day in this order; their time slots reflow to match"""
+    day: date
+    item_ids: List[int] = Field(min_length=1)
+
+class BulkItemsPatch(BaseModel):
+    create: List[BulkItemCreate] = Field(default_factory=list)
+    update: List[BulkItemUpdate] = Field(default_factory=list)
+    delete: List[int] = Field(default_factory=list)
+    reorder: List[ItemReorder] = Field(default_factory=list)
+
+class BulkItemsResult(BaseModel):
+    created: List[ItineraryItemRead] = Field(default_factory=list)
+    updated: List[ItineraryItemRead] = Field(default_factory=list)
+    deleted: List[int] = Field(default_factory=list)
+
+def _reflow(items: List[ItineraryItem], day: date):
+    """Lay items out in the given order over the slots they held: same first
+    start, same gaps between slots, each item keeping its own duration"""
+    timed = [it for it in items if it.start_time and it.end_time]
+    slots = sorted((minutes(it.start_time), minutes(it.end_time)) for it in timed)
+    gaps = [max(b[0] - a[1], 0) for a, b in zip(slots, slots[1:])] + [0]
+    at = slots[0][0] if slots else 0
+    for it, gap in zip(timed, gaps):
+        length = max(minutes(it.end_time) - minutes(it.start_time), 0)
+        it.start_time, it.end_time = clock(at), clock(at + length)
+        at += length + gap
+    for it in items:
+        it.day = day
+
 @router.post("", response_model=TripRead, status_code=201)
 def create_trip(trip: Trip, session: Session = Depends(get_session)):
     session.add(trip)
@@ -13,9 +64,40 @@ def create_trip(trip: Trip, session: Session = Depends(get_session)):
     session.refresh(trip)
     return trip
 
-@router.get("", response_model=List[TripRead])
-def list_trips(session: Session = Depends(get_session)):
-    return session.exec(select(Trip).order_by(Trip.start_date)).all()
+@router.get("", response_model=Union[List[TripSummaryRead], List[TripRead]])
+def list_trips(include: Optional[str] = Query(None, pattern=r"^summary$"), session: Session = Depends(get_session)):
+    if include != "summary":
+        return session.exec(select(Trip).order_by(Trip.start_date)).all()
+    # One grouped outer join instead of a /plan request per trip
+    rows = session.exec(
+        select(
+            Trip,
+            func.count(ItineraryItem.id),
+            func.count(func.distinct(ItineraryItem.day)),
+            func.coalesce(func.sum(ItineraryItem.cost), 0.0),
+            func.min(ItineraryItem.day),
+            func.max(ItineraryItem.day),
+        )
+        .outerjoin(ItineraryItem, ItineraryItem.trip_id == Trip.id)
+        .group_by(Trip.id)
+        .order_by(Trip.start_date)
+    ).all()
+    return [
+        TripSummaryRead(
+            **trip.model_dump(),
+            summary=TripSummary(items=items, days=days, total_cost=cost, first_day=first, last_day=last),
+        )
+        for trip, items, days, cost, first, last in rows
+    ]
+
+@router.get("/export")
+def export_trips(format: str = Query("ndjson", pattern=r"^(csv|ndjson)$")):
+    """Stream every trip with its items; memory stays flat regardless of volume"""
+    from ..services.export import MEDIA_TYPES, export_all  # rarely used; kept off the startup path
+    return StreamingResponse(
+        export_all(format), media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="trips.{format}"'},
+    )
 
 @router.get("/{trip_id}", response_model=TripRead)
 def get_trip(trip_id: int, session: Session = Depends(get_session)):
@@ -38,10 +120,10 @@ def update_trip(trip_id: int, patch: TripUpdate, session: Session = Depends(get_
 
 @router.delete("/{trip_id}", status_code=204)
 def delete_trip(trip_id: int, session: Session = Depends(get_session)):
-    trip = session.get(Trip, trip_id)
-    if not trip:
-        return
-    session.delete(trip)
+    # Items go first in one statement: tables created before ON DELETE CASCADE
+    # was declared keep their old foreign key and would reject the trip delete
+    session.exec(delete(ItineraryItem).where(ItineraryItem.trip_id == trip_id))
+    session.exec(delete(Trip).where(Trip.id == trip_id))
     session.commit()
 
 @router.post("/{trip_id}/items", response_model=ItineraryItemRead, status_code=201)
@@ -55,6 +137,56 @@ def add_item(trip_id: int, item: ItineraryItem, session: Session = Depends(get_s
     session.refresh(item)
     return item
 
+@router.post("/{trip_id}/items/bulk", response_model=List[ItineraryItemRead], status_code=201)
+def add_items(trip_id: int, items: List[BulkItemCreate], session: Session = Depends(get_session)):
+    """Create many items with one trip lookup and one commit"""
+    if not session.get(Trip, trip_id):
+        raise HTTPException(404, "Trip not found")
+    rows = [ItineraryItem(trip_id=trip_id, **i.model_dump()) for i in items]
+    session.add_all(rows)
+    session.commit()  # ids come back from the insert; no per-row refresh
+    return rows
+
+@router.patch("/{trip_id}/items/bulk", response_model=BulkItemsResult)
+def edit_items(trip_id: int, ops: BulkItemsPatch, session: Session = Depends(get_session)):
+    """Apply deletes, updates, creates and reorders in one transaction.
+
+    Every referenced id is loaded in one query and checked before anything
+    is written, so a bad id rejects the whole batch."""
+    if not session.get(Trip, trip_id):
+        raise HTTPException(404, "Trip not found")
+    touched = {u.id for u in ops.update} | {i for r in ops.reorder for i in r.item_ids}
+    if touched & set(ops.delete):
+        raise HTTPException(422, f"Items both edited and deleted: {sorted(touched & set(ops.delete))}")
+    reordered = [i for r in ops.reorder for i in r.item_ids]
+    if len(reordered) != len(set(reordered)):
+        raise HTTPException(422, "An item appears in more than one reorder position")
+    wanted = touched | set(ops.delete)
+    found = {}
+    if wanted:
+        found = {it.id: it for it in session.exec(
+            select(ItineraryItem).where(ItineraryItem.trip_id == trip_id, ItineraryItem.id.in_(wanted))
+        ).all()}
+    missing = sorted(wanted - found.keys())
+    if missing:
+        raise HTTPException(404, f"Items not found: {missing}")
+
+    for item_id in ops.delete:
+        session.delete(found[item_id])
+    for u in ops.update:
+        for k, v in u.model_dump(exclude_unset=True, exclude={"id"}).items():
+            setattr(found[u.id], k, v)
+    for r in ops.reorder:
+        _reflow([found[i] for i in r.item_ids], r.day)
+    created = [ItineraryItem(trip_id=trip_id, **i.model_dump()) for i in ops.create]
+    session.add_all(created)
+    session.commit()
+    return BulkItemsResult(
+        created=created,
+        updated=[found[i] for i in sorted(touched)],
+        deleted=sorted(set(ops.delete)),
+    )
+
 @router.get("/{trip_id}/items", response_model=List[ItineraryItemRead])
 def list_items(trip_id: int, session: Session = Depends(get_session)):
     if not session.get(Trip, trip_id):
@@ -81,6 +213,17 @@ def delete_item(trip_id: int, item_id: int, session: Session = Depends(get_sessi
     session.delete(item)
     session.commit()
 
+@router.get("/{trip_id}/export")
+def export_one(trip_id: int, format: str = Query("ics", pattern=r"^(ics|gpx|csv)$"), session: Session = Depends(get_session)):
+    from ..services.export import MEDIA_TYPES, export_trip
+    trip = session.get(Trip, trip_id)
+    if not trip:
+        raise HTTPException(404, "Trip not found")
+    return StreamingResponse(
+        export_trip(trip, format), media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="trip-{trip_id}.{format}"'},
+    )
+
 @router.get("/{trip_id}/plan")
 def get_plan(trip_id: int, session: Session = Depends(get_session)):
     if not session.get(Trip, trip_id):
@@ -91,6 +234,31 @@ def get_plan(trip_id: int, session: Session = Depends(get_session)):
         key = (it.day.isoformat() if it.day else "unscheduled")
         plan.setdefault(key, []).append(it)
     for day in plan:
-        plan[day].sort(key=lambda x: (x.start_time or None, x.end_time or None, x.title))
+        plan[day].sort(key=lambda x: (x.start_time is None, x.start_time or time.min, x.end_time or time.min, x.title))
     out = {day: [i.model_dump() | {"id": i.id} for i in lst] for day, lst in plan.items()}
     return {"trip_id": trip_id, "days": out}
+
+@router.post("/{trip_id}/days/{day}/replan")
+def replan(trip_id: int, day: date, req: ReplanRequest = ReplanRequest(), session: Session = Depends(get_session)):
+    trip = session.get(Trip, trip_id)
+    if not trip:
+        raise HTTPException(404, "Trip not found")
+    params = PlanParams(
+        destination=trip.destination or "",
+        start_date=day,
+        end_date=day,
+        interests=req.interests,
+        daily_start=req.daily_start,
+        daily_end=req.daily_end,
+        lunch_at=req.lunch_at,
+        pace=req.pace,
+        budget_level=req.budget_level,
+    )
+    items, changed, added = replan_day(session, trip, day, params, backfill=req.backfill)
+    return {
+        "trip_id": trip_id,
+        "day": day,
+        "changed": changed,
+        "added": added,
+        "items": [ItineraryItemRead(**i.model_dump()) for i in items],
+    }
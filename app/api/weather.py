@@ -0,0 +1,22 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, Query
+from ..services.weather import weather_service, daily_summary
+
+router = APIRouter()
+
+@router.get("/{city}")
+async def city_weather(city: str, days: int = Query(5, ge=1, le=5)):
+    if not weather_service.enabled:
+        raise HTTPException(503, "Weather API key not configured")
+    current, forecast = await asyncio.gather(
+        weather_service.get_weather(city),
+        weather_service.get_forecast(city, days=days),
+    )
+    if current is None and forecast is None:
+        raise HTTPException(502, f"Weather unavailable for {city}")
+    return {
+        "city": city,
+        "current": current,
+        "daily": daily_summary(forecast),
+        "forecasts": forecast["forecasts"] if forecast else [],
+    }
@@ -0,0 +1,73 @@
+import threading
+import time
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from .config import settings
+from ..db import engine
+from ..models import CacheVersion
+
+# Generation counter for the place catalog. Anything cached from Place rows
+# keys on catalog_version() and is dropped when a write bumps it.
+#
+# The counter lives in the cacheversion table so that a write in one uvicorn
+# worker invalidates every worker's caches. Reads hit the DB at most once per
+# CACHE_VERSION_POLL_S; between polls the last value is served from memory.
+
+class VersionCounter:
+    def __init__(self, name: str, poll_s: float):
+        self.name = name
+        self.poll_s = poll_s
+        self._lock = threading.Lock()
+        self._value = 0
+        self._checked = float("-inf")
+
+    def get(self) -> int:
+        if time.monotonic() - self._checked < self.poll_s:
+            return self._value
+        with self._lock:
+            now = time.monotonic()
+            if now - self._checked >= self.poll_s:
+                self._value = self._read()
+                self._checked = now
+            return self._value
+
+    def bump(self) -> int:
+        with self._lock:
+            with engine.begin() as conn:
+                bumped = conn.execute(
+                    update(CacheVersion).where(CacheVersion.name == self.name)
+                    .values(version=CacheVersion.version + 1)
+                ).rowcount
+                if not bumped:
+                    try:
+                        with conn.begin_nested():
+                            conn.execute(CacheVersion.__table__.insert().values(name=self.name, version=1))
+                    except IntegrityError:  # another worker inserted it first
+                        conn.execute(
+                            update(CacheVersion).where(CacheVersion.name == self.name)
+                            .values(version=CacheVersion.version + 1)
+                        )
+                self._value = conn.execute(
+                    select(CacheVersion.version).where(CacheVersion.name == self.name)
+                ).scalar_one()
+            self._checked = time.monotonic()
+            return self._value
+
+    def _read(self) -> int:
+        try:
+            with engine.connect() as conn:
+                return conn.execute(
+                    select(CacheVersion.version).where(CacheVersion.name == self.name)
+                ).scalar() or 0
+        except SQLAlchemyError:
+            # Table not created yet (scripts, first start): keep the local value
+            return self._value
+
+_catalog = VersionCounter("catalog", settings.cache_version_poll_s)
+
+def catalog_version() -> int:
+    return _catalog.get()
+
+def bump_catalog_version() -> int:
+    return _catalog.bump()
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -10,5 +11,31 @@ class Settings(BaseSettings):
     google_places_api_key: str = ""
     openweather_api_key: str = ""
     frontend_url: str = "http://localhost:8501"
+    debug: bool = False
+    db_max_queries_per_request: int = 20
+    db_slow_query_ms: float = 100.0
+    db_slow_log_size: int = 20
+    external_api_mode: str = "live"  # live|record|replay
+    external_fixtures_dir: str = "data/fixtures"
+    replay_latency_ms: float = 0.0
+    replay_error_rate: float = 0.0
+    replay_seed: Optional[int] = None
+    weather_forecast_ttl_s: float = 3 * 3600
+    weather_current_ttl_s: float = 600
+    weather_prefetch_timeout_s: float = 5.0
+    google_cache_ttl_s: float = 3600
+    google_max_pages: int = 3  # nearby search pages of 20 followed per category; Google stops at 3
+    google_max_concurrency: int = 8  # upstream Places requests in flight per plan
+    google_page_token_delay_s: float = 2.0  # a next_page_token is rejected until it activates
+    google_hedge_after_s: float = 1.0  # a Places call slower than this gets a second attempt; 0 disables
+    external_timeout_s: float = 3.0  # per upstream call, cut further by the request deadline
+    plan_deadline_s: float = 5.0  # budget of POST /plan/generate; external data is dropped past it
+    cache_version_poll_s: float = 1.0  # how stale another worker's catalog write can look
+    warmup_cities: int = 20  # hottest cities preloaded at startup; 0 disables
+    distance_matrix_dir: str = "data/distances"
+    plan_job_workers: int = 2
+    plan_job_max_pending: int = 50
+    plan_job_stale_s: float = 600  # running jobs not updated for this long are requeued
+    plan_job_max_attempts: int = 3  # a job found stale after this many runs is failed, not requeued
 
 settings = Settings()
@@ -0,0 +1,66 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional
+
+class DeadlineExceeded(TimeoutError):
+    """The request's time budget ran out before an external call could start"""
+
+@dataclass
+class Deadline:
+    """Time budget of one request, shared by every external call it makes"""
+    at: float  # time.monotonic() value
+    degraded: List[str] = field(default_factory=list)  # steps skipped or cut short, in order
+
+    def remaining(self) -> float:
+        return max(self.at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.at
+
+    def degrade(self, step: str):
+        if step not in self.degraded:
+            self.degraded.append(step)
+
+_current: ContextVar[Optional[Deadline]] = ContextVar("request_deadline", default=None)
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[Optional[Deadline]]:
+    """Run the block under a budget of seconds from now (None: unbounded).
+
+    Nested budgets never extend an outer one. Coroutines started with
+    asyncio.run inherit the budget; other threads need the context copied."""
+    outer = _current.get()
+    budget = Deadline(time.monotonic() + seconds) if seconds is not None else None
+    if outer is not None and (budget is None or outer.at <= budget.at):
+        budget = outer
+    token = _current.set(budget)
+    try:
+        yield budget
+    finally:
+        _current.reset(token)
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+def remaining(cap: Optional[float] = None, reserve: float = 0.0) -> Optional[float]:
+    """Seconds left in the current budget less reserve, at most cap; None if neither bounds it"""
+    budget = _current.get()
+    if budget is None:
+        return cap
+    left = max(budget.remaining() - reserve, 0.0)
+    return left if cap is None else min(cap, left)
+
+def call_timeout(cap: float) -> float:
+    """Timeout for one external call: cap, cut to what is left of the budget"""
+    left = remaining(cap)
+    if left <= 0:
+        raise DeadlineExceeded("request deadline exceeded")
+    return left
+
+def degrade(step: str):
+    """Note on the current budget, if any, that step was skipped or cut short"""
+    budget = _current.get()
+    if budget is not None:
+        budget.degrade(step)
@@ -0,0 +1,90 @@
+import heapq
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+
+logger = logging.getLogger("travel_planner.db")
+
+@dataclass
+class RequestQueryStats:
+    """Statements and DB time accumulated while serving one request"""
+    count: int = 0
+    total_ms: float = 0.0
+    slow: List[Tuple[float, str]] = field(default_factory=list)
+
+    def record(self, statement: str, elapsed_ms: float):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms >= settings.db_slow_query_ms:
+            self.slow.append((elapsed_ms, statement))
+
+_current: ContextVar[Optional[RequestQueryStats]] = ContextVar("request_query_stats", default=None)
+
+class SlowQueryLog:
+    """Rolling top-N of the slowest statements seen by this process"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._heap: List[Tuple[float, str, float]] = []
+        self._lock = threading.Lock()
+
+    def add(self, statement: str, elapsed_ms: float):
+        entry = (elapsed_ms, statement, time.time())
+        with self._lock:
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, entry)
+            elif elapsed_ms > self._heap[0][0]:
+                heapq.heapreplace(self._heap, entry)
+
+    def top(self) -> List[Dict]:
+        with self._lock:
+            entries = sorted(self._heap, reverse=True)
+        return [{"ms": round(ms, 2), "statement": stmt, "at": at} for ms, stmt, at in entries]
+
+    def clear(self):
+        with self._lock:
+            self._heap.clear()
+
+slow_query_log = SlowQueryLog(settings.db_slow_log_size)
+
+def start_request() -> RequestQueryStats:
+    stats = RequestQueryStats()
+    _current.set(stats)
+    return stats
+
+def current_stats() -> Optional[RequestQueryStats]:
+    return _current.get()
+
+def install(engine: Engine):
+    """Attach statement timing listeners to an engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+        stats = _current.get()
+        if stats is not None:
+            stats.record(statement, elapsed_ms)
+        if elapsed_ms >= settings.db_slow_query_ms:
+            slow_query_log.add(statement, elapsed_ms)
+
+def report(method: str, path: str, stats: RequestQueryStats):
+    """Log requests that exceed the statement budget or ran slow queries"""
+    if stats.count > settings.db_max_queries_per_request:
+        logger.warning(
+            "%s %s issued %d statements (%.1f ms total), limit is %d",
+            method, path, stats.count, stats.total_ms, settings.db_max_queries_per_request,
+        )
+    for elapsed_ms, statement in stats.slow:
+        logger.warning("%s %s slow query %.1f ms: %s", method, path, elapsed_ms, statement)
@@ -0,0 +1,81 @@
+from __future__ import annotations
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+import asyncio
+import threading
+
+T = TypeVar("T")
+
+class _Abandoned(Exception):
+    """The leading call was cancelled before it finished; a waiter should run it itself"""
+
+class SingleFlight:
+    """Coalesce concurrent identical async calls into one.
+
+    The first caller for a key runs the coroutine; callers arriving while it
+    is in flight await the same result instead of repeating the call. Plans
+    run in worker threads, each with its own event loop, so the shared result
+    is a thread-safe concurrent Future rather than an asyncio one.
+
+    The call runs as its own task, so a caller that stops waiting (its
+    deadline ran out) does not cancel it for the others. If the task is
+    cancelled anyway, e.g. because the leader's event loop shut down, the
+    waiters take that as a miss and one of them runs the call again."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        with self._lock:
+            self.calls += 1
+        while True:
+            with self._lock:
+                fut = self._inflight.get(key)
+                leader = fut is None
+                if leader:
+                    fut = Future()
+                    fut.set_running_or_notify_cancel()  # a cancelled follower must not cancel the shared result
+                    self._inflight[key] = fut
+                else:
+                    self.coalesced += 1
+            if leader:
+                task = asyncio.ensure_future(fn())
+                task.add_done_callback(lambda t: self._settle(key, fut, t))
+                return await asyncio.shield(task)
+            try:
+                return await asyncio.wrap_future(fut)
+            except _Abandoned:
+                continue
+
+    def _settle(self, key: Hashable, fut: Future, task: asyncio.Future):
+        with self._lock:
+            self._inflight.pop(key, None)
+        if task.cancelled():
+            fut.set_exception(_Abandoned())
+        elif task.exception() is not None:
+            fut.set_exception(task.exception())
+        else:
+            fut.set_result(task.result())
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced, "inflight": len(self._inflight)}
+
+_flights: Dict[str, SingleFlight] = {}
+_flights_lock = threading.Lock()
+
+def flight(name: str) -> SingleFlight:
+    """Process-wide single-flight group for one kind of upstream call"""
+    with _flights_lock:
+        if name not in _flights:
+            _flights[name] = SingleFlight(name)
+        return _flights[name]
+
+def flight_stats() -> Dict[str, Dict[str, int]]:
+    with _flights_lock:
+        groups = list(_flights.values())
+    return {g.name: g.stats() for g in groups}
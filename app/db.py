@@ -1,13 +1,35 @@
 import os
+from sqlalchemy import event, inspect, text
 from sqlmodel import SQLModel, create_engine, Session
+from .core import query_stats
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./travel.db")
 connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
 engine = create_engine(DATABASE_URL, echo=False, connect_args=connect_args)
+query_stats.install(engine)
+
+if DATABASE_URL.startswith("sqlite"):
+    @event.listens_for(engine, "connect")
+    def _sqlite_foreign_keys(dbapi_connection, _record):
+        # SQLite ignores FOREIGN KEY clauses (and ON DELETE CASCADE) unless enabled per connection
+        dbapi_connection.execute("PRAGMA foreign_keys=ON")
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    # create_all skips tables that already exist, so add nullable columns and
+    # indexes declared since
+    existing = inspect(engine)
+    for table in SQLModel.metadata.sorted_tables:
+        have = {c["name"] for c in existing.get_columns(table.name)}
+        missing = [c for c in table.columns if c.name not in have and c.nullable]
+        with engine.begin() as conn:
+            for column in missing:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"))
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
 
 def get_session():
-    with Session(engine) as session:
+    # Request-scoped: keep loaded state after commit so handlers can serialize
+    # what they wrote without a refresh round-trip per row
+    with Session(engine, expire_on_commit=False) as session:
         yield session
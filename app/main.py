@@ -1,13 +1,64 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import asyncio
+import logging
+import threading
+import time
+
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from sqlmodel import Session
 from .core.config import settings
-from .db import create_db_and_tables
+from .core import query_stats
+from .core.singleflight import flight_stats
+from .db import create_db_and_tables, engine
 from .api.trips import router as trips_router
 from .api.places import router as places_router
 from .api.recommendations import router as rec_router
-from .api.plan import router as plan_router
+from .api.plan import plan_jobs, router as plan_router
+from .api.weather import router as weather_router
+from .api.stats import router as stats_router
+from .services.google_places import google_places_service
+from .services.planner import warm_up
+from .services.spatial import grid_index
+from .services.weather import weather_service
+
+logger = logging.getLogger("travel_planner")
+
+warmup_state = {"status": "off"}  # off|running|done|failed
+
+def warm_catalog(limit: int):
+    """Preload hot cities off the startup path so the first plans skip index builds"""
+    t0 = time.perf_counter()
+    try:
+        with Session(engine) as session:
+            cities = warm_up(session, limit)
+            grid_index(session)
+    except Exception:
+        logger.exception("catalog warm-up failed")
+        warmup_state["status"] = "failed"
+        return
+    warmup_state.update(status="done", cities=len(cities), ms=round((time.perf_counter() - t0) * 1000))
+    logger.info("warmed %d cities in %d ms", len(cities), warmup_state["ms"])
+
+async def open_clients():
+    await google_places_service.http.open()
+    await weather_service.http.open()
 
-app = FastAPI(title="Travel Planner API", version="0.2.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    create_db_and_tables()
+    plan_jobs.resume()
+    # Neither step blocks serving: until the clients are open, calls use short-lived ones
+    clients = asyncio.create_task(open_clients())
+    if settings.warmup_cities:
+        warmup_state["status"] = "running"
+        threading.Thread(target=warm_catalog, args=(settings.warmup_cities,), name="catalog-warmup", daemon=True).start()
+    yield
+    await clients
+    await google_places_service.http.aclose()
+    await weather_service.http.aclose()
+
+app = FastAPI(title="Travel Planner API", version="0.2.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,9 +68,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.on_event("startup")
-def on_startup():
-    create_db_and_tables()
+@app.middleware("http")
+async def db_query_stats(request: Request, call_next):
+    stats = query_stats.start_request()
+    response = await call_next(request)
+    query_stats.report(request.method, request.url.path, stats)
+    if settings.debug:
+        response.headers["X-DB-Queries"] = str(stats.count)
+        response.headers["X-DB-Time"] = f"{stats.total_ms:.2f}"
+    return response
 
 @app.get("/")
 def root():
@@ -27,9 +84,23 @@ def root():
 
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    return {"status": "ok", "warmup": warmup_state["status"]}
+
+@app.get("/debug/slow-queries", include_in_schema=False)
+def slow_queries():
+    if not settings.debug:
+        raise HTTPException(404, "Not found")
+    return {"threshold_ms": settings.db_slow_query_ms, "queries": query_stats.slow_query_log.top()}
+
+@app.get("/debug/singleflight", include_in_schema=False)
+def singleflight_stats():
+    if not settings.debug:
+        raise HTTPException(404, "Not found")
+    return flight_stats()
 
 app.include_router(trips_router, prefix="/trips", tags=["Trips"])
 app.include_router(places_router, prefix="/places", tags=["Places"])
 app.include_router(rec_router, prefix="/Recommendations")
 app.include_router(plan_router, prefix="/plan", tags=["Planner"])
+app.include_router(weather_router, prefix="/weather", tags=["Weather"])
+app.include_router(stats_router, prefix="/stats", tags=["Stats"])
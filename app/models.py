@@ -1,5 +1,6 @@
-from datetime import date, time
+from datetime import date, datetime, time, timezone
 from typing import Optional
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field
 
 class TripBase(SQLModel):
@@ -18,6 +19,16 @@ class Trip(TripBase, table=True):
 class TripRead(TripBase):
     id: int
 
+class TripSummary(SQLModel):
+    items: int = 0
+    days: int = 0
+    total_cost: float = 0.0
+    first_day: Optional[date] = None
+    last_day: Optional[date] = None
+
+class TripSummaryRead(TripRead):
+    summary: TripSummary
+
 class TripUpdate(SQLModel):
     name: Optional[str] = None
     origin: Optional[str] = None
@@ -29,7 +40,7 @@ class TripUpdate(SQLModel):
     notes: Optional[str] = None
 
 class ItineraryItemBase(SQLModel):
-    trip_id: int = Field(foreign_key="trip.id")
+    trip_id: int = Field(foreign_key="trip.id", ondelete="CASCADE")
     day: Optional[date] = None
     title: str
     type: str = "activity"
@@ -42,6 +53,8 @@ class ItineraryItemBase(SQLModel):
     notes: Optional[str] = None
 
 class ItineraryItem(ItineraryItemBase, table=True):
+    # Every read goes through trip_id, usually narrowed to a day
+    __table_args__ = (Index("ix_itineraryitem_trip_id_day", "trip_id", "day"),)
     id: Optional[int] = Field(default=None, primary_key=True)
 
 class ItineraryItemRead(ItineraryItemBase):
@@ -68,9 +81,28 @@ class PlaceBase(SQLModel):
     rating: float = 4.5
     price_level: int = 2
     description: str = ""
+    hours: Optional[str] = None  # opening hours, see services/timeline.py; NULL = unknown
 
 class Place(PlaceBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
 
 class PlaceRead(PlaceBase):
     id: int
+
+class PlanJob(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    status: str = Field(default="queued", index=True)  # queued|running|done|failed
+    stage: str = "queued"
+    progress: int = 0  # percent
+    request: str  # PlanRequest JSON
+    result: Optional[str] = None  # same JSON body /plan/generate returns
+    trip_id: Optional[int] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class CacheVersion(SQLModel, table=True):
+    """Shared generation counters; process-local caches key on these"""
+    name: str = Field(primary_key=True)
+    version: int = 0
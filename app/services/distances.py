@@ -0,0 +1,164 @@
+from __future__ import annotations
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import re
+
+import numpy as np
+from sqlalchemy import func
+from sqlmodel import Session, select
+from ..core.cache import TTLCache
+from ..core.catalog import catalog_version
+from ..core.config import settings
+from ..models import ItineraryItemBase, Place
+from .geo import haversine_km
+
+# Per-city files under settings.distance_matrix_dir:
+#   <slug>.ids.npy   int64 place ids, sorted; row/column order of the matrix
+#   <slug>.dist.npy  float32 n x n great-circle distances in km
+#   <slug>.json      metadata, including a fingerprint of the city's places
+FORMAT_VERSION = 1
+EARTH_RADIUS_KM = 6371.0
+
+logger = logging.getLogger("travel_planner.distances")
+
+Row = Tuple[int, float, float]  # id, lat, lng
+Distance = Callable[[object, object], float]
+
+def point_km(a, b) -> float:
+    return haversine_km((a.lat, a.lng), (b.lat, b.lng))
+
+def _city_norm(city: str) -> str:
+    return (city or "").split(",")[0].strip().lower()
+
+def city_slug(city: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", _city_norm(city)).strip("-") or "_"
+
+def _paths(city: str, directory: Optional[str] = None) -> Tuple[Path, Path, Path]:
+    base = Path(directory or settings.distance_matrix_dir) / city_slug(city)
+    return base.with_suffix(".ids.npy"), base.with_suffix(".dist.npy"), base.with_suffix(".json")
+
+def city_rows(session: Session, city: str) -> List[Row]:
+    """(id, lat, lng) for the city's places, matched the way the planner matches cities"""
+    return list(session.exec(
+        select(Place.id, Place.lat, Place.lng)
+        .where(func.lower(func.trim(Place.city)) == _city_norm(city))
+        .order_by(Place.id)
+    ).all())
+
+def fingerprint(rows: List[Row]) -> str:
+    """Changes whenever a place is added, removed or moved"""
+    h = hashlib.sha1()
+    for pid, lat, lng in rows:
+        h.update(f"{pid}:{lat!r}:{lng!r};".encode())
+    return h.hexdigest()
+
+def haversine_matrix(lat: np.ndarray, lng: np.ndarray) -> np.ndarray:
+    lat, lng = np.radians(lat), np.radians(lng)
+    dlat = lat[:, None] - lat[None, :]
+    dlng = lng[:, None] - lng[None, :]
+    h = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlng / 2) ** 2
+    return (2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))).astype(np.float32)
+
+def write_city(session: Session, city: str, directory: Optional[str] = None) -> Dict:
+    """Precompute one city's matrix; files are replaced atomically so live readers never see a partial write"""
+    rows = city_rows(session, city)
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    dist = haversine_matrix(np.array([r[1] for r in rows]), np.array([r[2] for r in rows]))
+    meta = {
+        "city": _city_norm(city),
+        "format": FORMAT_VERSION,
+        "count": len(rows),
+        "fingerprint": fingerprint(rows),
+        "built_at": datetime.now(timezone.utc).isoformat(),
+    }
+    ids_path, dist_path, meta_path = _paths(city, directory)
+    ids_path.parent.mkdir(parents=True, exist_ok=True)
+    for path, array in ((ids_path, ids), (dist_path, dist)):
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp, path)
+    tmp = meta_path.with_name(meta_path.name + ".tmp")
+    tmp.write_text(json.dumps(meta))
+    os.replace(tmp, meta_path)  # written last: it is what marks the pair current
+    return meta
+
+class DistanceMatrix:
+    """Lookups into a memory-mapped city matrix.
+
+    Places (ORM rows or PlaceRef) are found by id and itinerary items
+    (copies of places) by their coordinates; anything not in the matrix falls back to haversine."""
+
+    def __init__(self, rows: List[Row], dist: np.ndarray):
+        self.dist = dist
+        self.by_id = {pid: k for k, (pid, _, _) in enumerate(rows)}
+        self.by_coords = {(lat, lng): k for k, (_, lat, lng) in enumerate(rows)}
+
+    def _index(self, p) -> Optional[int]:
+        if isinstance(p, ItineraryItemBase):
+            return self.by_coords.get((p.lat, p.lng))
+        return self.by_id.get(p.id)
+
+    def km(self, a, b) -> float:
+        i, j = self._index(a), self._index(b)
+        if i is None or j is None:
+            return point_km(a, b)
+        return float(self.dist[i, j])
+
+    __call__ = km  # usable wherever a Distance function is expected
+
+    @classmethod
+    def of(cls, places) -> "DistanceMatrix":
+        """In-memory matrix over a set of places, for reuse across several routings"""
+        rows = [(p.id, p.lat, p.lng) for p in places]
+        return cls(rows, haversine_matrix(np.array([r[1] for r in rows]), np.array([r[2] for r in rows])))
+
+def load_city(session: Session, city: str, directory: Optional[str] = None) -> Optional[DistanceMatrix]:
+    """Open the precomputed matrix if it matches the current catalog, else None"""
+    ids_path, dist_path, meta_path = _paths(city, directory)
+    try:
+        meta = json.loads(meta_path.read_text())
+    except (OSError, ValueError):
+        return None
+    rows = city_rows(session, city)
+    if meta.get("format") != FORMAT_VERSION or meta.get("fingerprint") != fingerprint(rows):
+        logger.info("distance matrix for %s is stale; computing on the fly", city)
+        return None
+    try:
+        ids = np.load(ids_path, mmap_mode="r")
+        dist = np.load(dist_path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if dist.shape != (len(rows), len(rows)) or not np.array_equal(ids, [r[0] for r in rows]):
+        return None
+    return DistanceMatrix(rows, dist)
+
+def km_matrix(stops, dist: Distance) -> Optional[np.ndarray]:
+    """Pairwise km between stops as one array: a slice of dist when it is a
+    matrix holding every stop, haversine when it is point_km or the matrix
+    lacks a stop, None for any other distance function. Stops need coordinates."""
+    if isinstance(dist, DistanceMatrix):
+        rows = [dist._index(s) for s in stops]
+        if None not in rows:
+            return dist.dist[np.ix_(rows, rows)]
+    elif dist is not point_km:
+        return None
+    return haversine_matrix(np.array([s.lat for s in stops]), np.array([s.lng for s in stops]))
+
+_matrices = TTLCache(ttl=3600, maxsize=256)
+
+def distance_fn(session: Session, city: str) -> Distance:
+    """Distance function for a city: matrix lookups when a fresh file exists, haversine otherwise.
+
+    The staleness check runs once per city and catalog version."""
+    key = (_city_norm(city), catalog_version())
+    matrix = _matrices.get(key)
+    if matrix is None:
+        matrix = load_city(session, city) or False
+        _matrices.set(key, matrix)
+    return matrix if matrix else point_km
@@ -0,0 +1,172 @@
+from __future__ import annotations
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, Optional
+from xml.sax.saxutils import escape, quoteattr
+import csv
+import io
+import json
+
+from sqlmodel import Session, select
+from ..db import engine
+from ..models import ItineraryItem, Trip
+
+YIELD_PER = 1000
+TRIP_COLS = [Trip.id, Trip.name, Trip.origin, Trip.destination, Trip.start_date, Trip.end_date,
+             Trip.budget, Trip.travelers, Trip.notes]
+ITEM_COLS = [ItineraryItem.id, ItineraryItem.day, ItineraryItem.title, ItineraryItem.type,
+             ItineraryItem.location_name, ItineraryItem.lat, ItineraryItem.lng, ItineraryItem.start_time,
+             ItineraryItem.end_time, ItineraryItem.cost, ItineraryItem.notes]
+TRIP_FIELDS = ["trip_id", "trip_name", "origin", "destination", "start_date", "end_date", "budget", "travelers", "trip_notes"]
+TRIP_KEYS = ["id", "name", "origin", "destination", "start_date", "end_date", "budget", "travelers", "notes"]
+ITEM_FIELDS = ["item_id", "day", "title", "type", "location_name", "lat", "lng", "start_time", "end_time", "cost", "notes"]
+
+MEDIA_TYPES = {
+    "ics": "text/calendar",
+    "gpx": "application/gpx+xml",
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+def _item_rows(trip_id: int) -> Iterator:
+    """Stream one trip's items from a server-side cursor in their own session"""
+    with Session(engine) as session:
+        stmt = (select(*ITEM_COLS).where(ItineraryItem.trip_id == trip_id)
+                .order_by(ItineraryItem.day, ItineraryItem.start_time)
+                .execution_options(yield_per=YIELD_PER))
+        yield from session.exec(stmt)
+
+def _trip_item_rows() -> Iterator:
+    """Every trip joined with its items, ordered so each trip's rows are contiguous"""
+    with Session(engine) as session:
+        stmt = (select(*TRIP_COLS, *ITEM_COLS)
+                .outerjoin(ItineraryItem, ItineraryItem.trip_id == Trip.id)
+                .order_by(Trip.id, ItineraryItem.day, ItineraryItem.start_time)
+                .execution_options(yield_per=YIELD_PER))
+        yield from session.exec(stmt)
+
+def _iso(v) -> Optional[str]:
+    return v.isoformat() if v is not None else None
+
+def _buffered(lines: Iterable[str], size: int = 64 * 1024) -> Iterator[str]:
+    """Coalesce small lines into chunks so the response is not one write per row"""
+    buf, n = [], 0
+    for line in lines:
+        buf.append(line)
+        n += len(line)
+        if n >= size:
+            yield "".join(buf)
+            buf, n = [], 0
+    if buf:
+        yield "".join(buf)
+
+ICS_LINE_OCTETS = 75  # RFC 5545 3.1: longer content lines are folded
+
+def _ics_text(v: Optional[str]) -> str:
+    return ((v or "").replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\n").replace("\n", "\\n"))
+
+def _ics_fold(line: str) -> str:
+    """Content line with CRLF, folded at 75 octets without splitting a UTF-8 sequence"""
+    data = line.encode("utf-8")
+    if len(data) <= ICS_LINE_OCTETS:
+        return line + "\r\n"
+    parts = []
+    limit = ICS_LINE_OCTETS
+    while len(data) > limit:
+        cut = limit
+        while data[cut] & 0xC0 == 0x80:  # continuation byte: back up to the character start
+            cut -= 1
+        parts.append(data[:cut].decode("utf-8"))
+        data = data[cut:]
+        limit = ICS_LINE_OCTETS - 1  # folded lines start with a space
+    parts.append(data.decode("utf-8"))
+    return "\r\n ".join(parts) + "\r\n"
+
+def _ics_lines(trip_name: str, rows: Iterable) -> Iterator[str]:
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    yield "BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Travel Planner//EN\r\n"
+    yield _ics_fold(f"X-WR-CALNAME:{_ics_text(trip_name)}")
+    for r in rows:
+        if r.day is None:
+            continue
+        lines = ["BEGIN:VEVENT", f"UID:item-{r.id}@travel-planner", f"DTSTAMP:{stamp}"]
+        if r.start_time is not None:
+            lines.append(f"DTSTART:{datetime.combine(r.day, r.start_time):%Y%m%dT%H%M%S}")
+            if r.end_time:
+                lines.append(f"DTEND:{datetime.combine(r.day, r.end_time):%Y%m%dT%H%M%S}")
+        else:
+            lines.append(f"DTSTART;VALUE=DATE:{r.day:%Y%m%d}")
+        lines += [f"SUMMARY:{_ics_text(r.title)}", f"LOCATION:{_ics_text(r.location_name)}"]
+        if r.lat is not None and r.lng is not None:
+            lines.append(f"GEO:{r.lat};{r.lng}")
+        lines += [f"DESCRIPTION:{_ics_text(r.notes)}", f"CATEGORIES:{_ics_text(r.type)}", "END:VEVENT"]
+        yield "".join(_ics_fold(line) for line in lines)
+    yield "END:VCALENDAR\r\n"
+
+def _gpx_lines(trip_name: str, rows: Iterable) -> Iterator[str]:
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield '<gpx version="1.1" creator="Travel Planner" xmlns="http://www.topografix.com/GPX/1/1">\n'
+    yield f"  <metadata><name>{escape(trip_name or '')}</name></metadata>\n"
+    for r in rows:
+        if r.lat is None or r.lng is None:
+            continue
+        when = ""
+        if r.day is not None and r.start_time is not None:
+            when = f"<time>{datetime.combine(r.day, r.start_time):%Y-%m-%dT%H:%M:%S}</time>"
+        yield (f"  <wpt lat={quoteattr(str(r.lat))} lon={quoteattr(str(r.lng))}>{when}"
+               f"<name>{escape(r.title or '')}</name><desc>{escape(r.notes or '')}</desc>"
+               f"<type>{escape(r.type or '')}</type></wpt>\n")
+    yield "</gpx>\n"
+
+def _csv_lines(header: list, rows: Iterable[list]) -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    yield buf.getvalue()
+
+def _trip_values(r) -> list:
+    return [r[0], r[1], r[2], r[3], _iso(r[4]), _iso(r[5]), r[6], r[7], r[8]]
+
+def _item_values(r, n: int = 0) -> list:
+    """Item columns starting at offset n of a result row"""
+    return [r[n], _iso(r[n + 1]), r[n + 2], r[n + 3], r[n + 4], r[n + 5], r[n + 6],
+            _iso(r[n + 7]), _iso(r[n + 8]), r[n + 9], r[n + 10]]
+
+def export_trip(trip: Trip, fmt: str) -> Iterator[str]:
+    rows = _item_rows(trip.id)
+    if fmt == "ics":
+        lines = _ics_lines(trip.name, rows)
+    elif fmt == "gpx":
+        lines = _gpx_lines(trip.name, rows)
+    else:
+        lines = _csv_lines(ITEM_FIELDS, (_item_values(r) for r in rows))
+    return _buffered(lines)
+
+def export_all(fmt: str) -> Iterator[str]:
+    """All trips with their items: CSV is one row per item, NDJSON one line per trip"""
+    rows = _trip_item_rows()
+    if fmt == "csv":
+        n = len(TRIP_COLS)
+        lines = _csv_lines(TRIP_FIELDS + ITEM_FIELDS, (_trip_values(r) + _item_values(r, n) for r in rows))
+    else:
+        lines = _ndjson_trips(rows)
+    return _buffered(lines)
+
+def _ndjson_trips(rows: Iterable) -> Iterator[str]:
+    n = len(TRIP_COLS)
+    current, items = None, []
+    for r in rows:
+        if current is not None and r[0] != current["id"]:
+            yield json.dumps(current | {"items": items}, ensure_ascii=False) + "\n"
+            current, items = None, []
+        if current is None:
+            current = dict(zip(TRIP_KEYS, _trip_values(r)))
+        if r[n] is not None:
+            items.append(dict(zip(ITEM_FIELDS, _item_values(r, n))))
+    if current is not None:
+        yield json.dumps(current | {"items": items}, ensure_ascii=False) + "\n"
@@ -0,0 +1,54 @@
+from typing import Tuple
+import math
+
+def haversine_km(a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    R = 6371.0
+    lat1, lon1 = math.radians(a[0]), math.radians(a[1])
+    lat2, lon2 = math.radians(b[0]), math.radians(b[1])
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    h = math.sin(dlat/2)**2 + math.cos(lat1)*math.cos(lat2)*math.sin(dlon/2)**2
+    return 2 * R * math.asin(math.sqrt(h))
+
+class KDTree:
+    """Static 2-d tree over (lat, lng) points for nearest-neighbour lookups.
+
+    Coordinates are projected equirectangularly around the points' mean
+    latitude, which is accurate enough within a city. Lookups are
+    O(log n) on average; points rejected by the predicate are skipped
+    without giving up the pruning."""
+
+    def __init__(self, items, key=lambda it: (it.lat, it.lng)):
+        pts = [(key(it), it) for it in items]
+        lat0 = sum(p[0][0] for p in pts) / len(pts) if pts else 0.0
+        self._kx = math.cos(math.radians(lat0))
+        self._root = self._build([((ll[1] * self._kx, ll[0]), it) for ll, it in pts], 0)
+
+    def _build(self, pts, depth):
+        if not pts:
+            return None
+        axis = depth % 2
+        pts.sort(key=lambda p: p[0][axis])
+        mid = len(pts) // 2
+        return (pts[mid], axis, self._build(pts[:mid], depth + 1), self._build(pts[mid + 1:], depth + 1))
+
+    def nearest(self, lat: float, lng: float, predicate=None):
+        """Closest item to (lat, lng) accepted by predicate, or None"""
+        q = (lng * self._kx, lat)
+        best = [None, float("inf")]
+
+        def visit(node):
+            if node is None:
+                return
+            (pt, item), axis, left, right = node
+            d = (pt[0] - q[0]) ** 2 + (pt[1] - q[1]) ** 2
+            if d < best[1] and (predicate is None or predicate(item)):
+                best[0], best[1] = item, d
+            diff = q[axis] - pt[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            visit(near)
+            if diff * diff < best[1]:
+                visit(far)
+
+        visit(self._root)
+        return best[0]
@@ -1,77 +1,223 @@
+import asyncio
+from contextlib import nullcontext
 import httpx
-from typing import List, Dict, Optional
+from typing import AsyncIterator, Callable, List, Dict, Optional, Tuple
+from ..core.cache import TTLCache
 from ..core.config import settings
+from ..core.deadline import call_timeout, degrade, remaining
+from ..core.singleflight import flight
+from .transport import SharedClient, build_transport, hedged
+
+PAGE_TOKEN_RETRIES = 2  # extra tries for a next_page_token that is not active yet
 
 class GooglePlacesService:
-    def __init__(self):
-        self.api_key = settings.google_places_api_key
+    def __init__(self, api_key: Optional[str] = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.api_key = settings.google_places_api_key if api_key is None else api_key
         self.base_url = "https://maps.googleapis.com/maps/api/place"
+        self.transport = transport
+        self.http = SharedClient(transport)
+        self.results_cache = TTLCache(ttl=settings.google_cache_ttl_s)
+
+    @property
+    def enabled(self) -> bool:
+        """Replayed fixtures need no key; live and record modes do"""
+        return bool(self.api_key) or settings.external_api_mode == "replay"
+
+    def _client(self):
+        return self.http.get()
+
+    async def _get(self, client: httpx.AsyncClient, url: str, params: Dict,
+                   limit: Optional[asyncio.Semaphore] = None) -> httpx.Response:
+        """GET timed out by what is left of the request deadline, hedged when slow.
+
+        Each attempt holds its own slot of limit, if given, and takes its
+        timeout once it starts, so a hedge never runs past the deadline or
+        beyond the caller's concurrency bound; with less time left than the
+        hedge delay there is no hedge at all."""
+        async def attempt() -> httpx.Response:
+            async with limit or nullcontext():
+                return await client.get(url, params=params, timeout=call_timeout(settings.external_timeout_s))
+
+        after_s = settings.google_hedge_after_s
+        left = remaining()
+        if left is not None and left <= after_s:
+            after_s = 0
+        return await hedged(attempt, after_s)
     
-    async def search_places(self, city: str, place_type: str = None, radius: int = 50000) -> List[Dict]:
-        """Search for places in a city using Google Places API"""
-        if not self.api_key:
-            return []
-        
-        # First get city coordinates
+    async def geocode(self, city: str) -> Optional[Tuple[float, float]]:
+        """City coordinates; every category search for a city shares one lookup"""
+        if not self.enabled:
+            return None
+        cache_key = ("geocode", city.strip().lower())
+        cached = self.results_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        return await flight("google.geocode").do(cache_key, lambda: self._geocode(city, cache_key))
+
+    async def _geocode(self, city: str, cache_key) -> Optional[Tuple[float, float]]:
         geocode_url = f"https://maps.googleapis.com/maps/api/geocode/json"
         geocode_params = {
             "address": city,
             "key": self.api_key
         }
-        
-        async with httpx.AsyncClient() as client:
+        async with self._client() as client:
             try:
-                # Get city coordinates
-                geocode_response = await client.get(geocode_url, params=geocode_params)
+                geocode_response = await self._get(client, geocode_url, geocode_params)
                 geocode_data = geocode_response.json()
-                
-                if not geocode_data.get("results"):
-                    return []
-                
-                location = geocode_data["results"][0]["geometry"]["location"]
-                lat, lng = location["lat"], location["lng"]
-                
-                # Search for places
-                search_url = f"{self.base_url}/nearbysearch/json"
-                search_params = {
-                    "location": f"{lat},{lng}",
-                    "radius": radius,
-                    "key": self.api_key
+            except Exception as e:
+                print(f"Error geocoding {city}: {e}")
+                return None
+        if not geocode_data.get("results"):
+            return None
+        location = geocode_data["results"][0]["geometry"]["location"]
+        coords = (location["lat"], location["lng"])
+        self.results_cache.set(cache_key, coords)
+        return coords
+
+    @property
+    def page_token_delay_s(self) -> float:
+        """A next_page_token only works a couple of seconds after it is issued; fixtures have no such delay"""
+        return 0.0 if settings.external_api_mode == "replay" else settings.google_page_token_delay_s
+
+    async def search_places(self, city: str, place_type: str = None, radius: int = 50000,
+                            max_pages: Optional[int] = None) -> List[Dict]:
+        """Search for places in a city using Google Places API, following up to max_pages result pages"""
+        places: List[Dict] = []
+        async for page in self.iter_places(city, place_type, radius, max_pages):
+            places.extend(page)
+        return places
+
+    async def iter_places(self, city: str, place_type: Optional[str] = None, radius: int = 50000,
+                          max_pages: Optional[int] = None, limit: Optional[asyncio.Semaphore] = None,
+                          more: Optional[Callable[[], bool]] = None) -> AsyncIterator[List[Dict]]:
+        """Nearby search results one page (up to 20 places) at a time, as they arrive.
+
+        Follows next_page_token up to max_pages (GOOGLE_MAX_PAGES; Google
+        serves at most 3). Each upstream request holds limit, if given, so
+        callers can bound how many run at once; the token delay is waited
+        outside it. more is checked before every follow-up page and stops
+        the search when it returns False. Concurrent searches for the same
+        (city, category, radius) share each page's upstream call."""
+        if not self.enabled:
+            return
+        max_pages = max_pages or settings.google_max_pages
+        cache_key = ("nearby", city.strip().lower(), place_type, radius)
+        cached = self.results_cache.get(cache_key)  # (pages, complete)
+        if cached is not None and (cached[1] or len(cached[0]) >= max_pages):
+            for page in cached[0][:max_pages]:
+                yield page
+            return
+        coords = await self.geocode(city)
+        if coords is None:
+            return
+        pages: List[List[Dict]] = []
+        token: Optional[str] = None
+        async with self._client() as client:
+            while len(pages) < max_pages:
+                if token is not None:
+                    left = remaining()
+                    if left is not None and left <= self.page_token_delay_s:
+                        return  # the next page could not arrive within the request deadline
+                    await asyncio.sleep(self.page_token_delay_s)
+                    if more is not None and not more():
+                        return
+                page_key = cache_key + (token,)
+                result = await flight("google.nearby").do(
+                    page_key, lambda: self._nearby_page(client, city, coords, place_type, radius, token, limit))
+                if result is None:
+                    return
+                places, token = result
+                pages.append(places)
+                if any(pages):
+                    self.results_cache.set(cache_key, (list(pages), token is None))
+                yield places
+                if token is None:
+                    return
+
+    async def _nearby_page(self, client: httpx.AsyncClient, city: str, coords: Tuple[float, float],
+                           place_type: Optional[str], radius: int, token: Optional[str],
+                           limit: Optional[asyncio.Semaphore]) -> Optional[Tuple[List[Dict], Optional[str]]]:
+        """One nearby search page and the token for the next one; None on error"""
+        search_url = f"{self.base_url}/nearbysearch/json"
+        if token is not None:
+            # Follow-up pages take only the token; it encodes the original query
+            search_params = {"pagetoken": token, "key": self.api_key}
+        else:
+            lat, lng = coords
+            search_params = {
+                "location": f"{lat},{lng}",
+                "radius": radius,
+                "key": self.api_key
+            }
+            if place_type:
+                type_mapping = {
+                    "sights": "tourist_attraction",
+                    "museum": "museum",
+                    "food": "restaurant",
+                    "nature": "park",
+                    "shopping": "shopping_mall",
+                    "nightlife": "night_club"
                 }
-                
-                if place_type:
-                    type_mapping = {
-                        "sights": "tourist_attraction",
-                        "museum": "museum",
-                        "food": "restaurant",
-                        "nature": "park",
-                        "shopping": "shopping_mall",
-                        "nightlife": "night_club"
-                    }
-                    search_params["type"] = type_mapping.get(place_type, "tourist_attraction")
-                
-                search_response = await client.get(search_url, params=search_params)
+                search_params["type"] = type_mapping.get(place_type, "tourist_attraction")
+        try:
+            for attempt in range(PAGE_TOKEN_RETRIES + 1):
+                search_response = await self._get(client, search_url, search_params, limit)
                 search_data = search_response.json()
-                
-                places = []
-                for result in search_data.get("results", [])[:20]:  # Limit to 20 results
-                    place = {
-                        "city": city,
-                        "name": result.get("name", ""),
-                        "category": self._map_google_type_to_category(result.get("types", [])),
-                        "lat": result["geometry"]["location"]["lat"],
-                        "lng": result["geometry"]["location"]["lng"],
-                        "rating": result.get("rating", 4.0),
-                        "price_level": result.get("price_level", 2),
-                        "description": result.get("vicinity", "")
-                    }
-                    places.append(place)
-                
-                return places
-                
+                # A token used before it is active is rejected; wait and try again
+                if token is None or search_data.get("status") != "INVALID_REQUEST" or attempt == PAGE_TOKEN_RETRIES:
+                    break
+                await asyncio.sleep(self.page_token_delay_s)
+        except Exception as e:
+            print(f"Error fetching places: {e}")
+            degrade("places")  # the rest of this search is lost to the plan
+            return None
+        places = []
+        for result in search_data.get("results", []):
+            place = {
+                "city": city,
+                "name": result.get("name", ""),
+                "category": self._map_google_type_to_category(result.get("types", [])),
+                "lat": result["geometry"]["location"]["lat"],
+                "lng": result["geometry"]["location"]["lng"],
+                "rating": result.get("rating", 4.0),
+                "price_level": result.get("price_level", 2),
+                "description": result.get("vicinity", "")
+            }
+            places.append(place)
+        return places, search_data.get("next_page_token") or None
+
+    async def search_hub_cities(self, country: str, limit: int = 6) -> List[Dict]:
+        """Major cities of a country, most prominent first, via Places text search"""
+        if not self.enabled:
+            return []
+        cache_key = ("hubs", country.strip().lower())
+        cached = self.results_cache.get(cache_key)
+        if cached is not None:
+            return cached[:limit]
+        hubs = await flight("google.hubs").do(cache_key, lambda: self._search_hub_cities(country, cache_key))
+        return hubs[:limit]
+
+    async def _search_hub_cities(self, country: str, cache_key) -> List[Dict]:
+        params = {
+            "query": f"major cities in {country}",
+            "type": "locality",
+            "key": self.api_key
+        }
+        async with self._client() as client:
+            try:
+                response = await self._get(client, f"{self.base_url}/textsearch/json", params)
+                data = response.json()
             except Exception as e:
-                print(f"Error fetching places: {e}")
+                print(f"Error fetching hub cities: {e}")
                 return []
+        hubs = [{
+            "name": r.get("name", ""),
+            "lat": r["geometry"]["location"]["lat"],
+            "lng": r["geometry"]["location"]["lng"],
+        } for r in data.get("results", []) if r.get("name")]
+        if hubs:
+            self.results_cache.set(cache_key, hubs)
+        return hubs
     
     def _map_google_type_to_category(self, types: List[str]) -> str:
         """Map Google Place types to our categories"""
@@ -93,4 +239,4 @@ class GooglePlacesService:
         
         return "activity"  # Default category
 
-google_places_service = GooglePlacesService()
+google_places_service = GooglePlacesService(transport=build_transport())
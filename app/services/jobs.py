@@ -0,0 +1,157 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+import json
+import logging
+import threading
+
+from sqlalchemy import func, update
+from sqlmodel import Session, select
+from ..db import engine
+from ..models import PlanJob
+
+logger = logging.getLogger("travel_planner.jobs")
+
+ACTIVE = ("queued", "running")
+
+Progress = Callable[[int, str], None]
+Handler = Callable[[Dict, Progress], Dict]
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+class QueueFull(Exception):
+    pass
+
+class JobLost(Exception):
+    """The job was requeued or taken over by another worker while this one ran it"""
+
+class JobQueue:
+    """In-process worker pool over jobs persisted in the planjob table.
+
+    The table is the source of truth: workers claim a queued row with a
+    conditional UPDATE, so a job runs once even if several API processes
+    share the database, and resume() picks up jobs left behind by a worker
+    that died mid-run (running rows whose heartbeat went stale). Every
+    write of a run is conditioned on the attempt that claimed the row, so a
+    worker that was presumed dead cannot overwrite its successor."""
+
+    def __init__(self, handler: Handler, workers: int, max_pending: int, stale_s: float, max_attempts: int = 3):
+        self.handler = handler
+        self.max_pending = max_pending
+        self.stale_s = stale_s
+        self.max_attempts = max_attempts
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="plan-job")
+
+    def submit(self, request: Dict) -> PlanJob:
+        with Session(engine, expire_on_commit=False) as session:
+            pending = session.exec(select(func.count(PlanJob.id)).where(PlanJob.status.in_(ACTIVE))).one()
+            if pending >= self.max_pending:
+                raise QueueFull(f"{pending} plan jobs already pending")
+            job = PlanJob(request=json.dumps(request))
+            session.add(job)
+            session.commit()
+        self._pool.submit(self._run, job.id)
+        return job
+
+    def get(self, job_id: int) -> Optional[PlanJob]:
+        with Session(engine) as session:
+            return session.get(PlanJob, job_id)
+
+    def resume(self) -> int:
+        """Requeue jobs that were queued or stuck running when the previous worker stopped.
+
+        A stuck job that already used max_attempts is failed instead, so a
+        plan that kills its worker cannot take the queue down forever."""
+        stale = _now() - timedelta(seconds=self.stale_s)
+        with Session(engine) as session:
+            session.exec(
+                update(PlanJob)
+                .where(PlanJob.status == "running", PlanJob.updated_at < stale, PlanJob.attempts >= self.max_attempts)
+                .values(status="failed", stage="failed", error=f"gave up after {self.max_attempts} attempts",
+                        updated_at=_now())
+            )
+            session.exec(
+                update(PlanJob)
+                .where(PlanJob.status == "running", PlanJob.updated_at < stale)
+                .values(status="queued", stage="queued", progress=0, updated_at=_now())
+            )
+            session.commit()
+            ids = session.exec(select(PlanJob.id).where(PlanJob.status == "queued").order_by(PlanJob.id)).all()
+        for job_id in ids:
+            self._pool.submit(self._run, job_id)
+        if ids:
+            logger.info("resumed %d plan jobs", len(ids))
+        return len(ids)
+
+    def _update(self, job_id: int, attempt: int, **values) -> bool:
+        """Write values if attempt still owns the running job; False once it does not"""
+        with Session(engine) as session:
+            owned = session.exec(
+                update(PlanJob)
+                .where(PlanJob.id == job_id, PlanJob.status == "running", PlanJob.attempts == attempt)
+                .values(updated_at=_now(), **values)
+            ).rowcount
+            session.commit()
+        return bool(owned)
+
+    def _heartbeat(self, job_id: int, attempt: int, stop: threading.Event):
+        # several beats per stale_s, so a slow handler step is not mistaken for a dead worker
+        while not stop.wait(self.stale_s / 4):
+            if not self._update(job_id, attempt):
+                return
+
+    def _progress(self, job_id: int, attempt: int, pct: int, stage: str):
+        if not self._update(job_id, attempt, progress=pct, stage=stage):
+            raise JobLost(f"plan job {job_id} attempt {attempt} no longer owns the job")
+
+    def _claim(self, job_id: int) -> Optional[tuple]:
+        with Session(engine) as session:
+            claimed = session.exec(
+                update(PlanJob)
+                .where(PlanJob.id == job_id, PlanJob.status == "queued")
+                .values(status="running", stage="starting", attempts=PlanJob.attempts + 1, updated_at=_now())
+            ).rowcount
+            session.commit()
+            if not claimed:
+                return None
+            job = session.get(PlanJob, job_id)
+            return json.loads(job.request), job.attempts
+
+    def _run(self, job_id: int):
+        claimed = self._claim(job_id)
+        if claimed is None:
+            return  # already taken by another worker
+        request, attempt = claimed
+        stop = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(job_id, attempt, stop), daemon=True,
+                         name=f"plan-job-{job_id}-heartbeat").start()
+        try:
+            result = self.handler(request, lambda pct, stage: self._progress(job_id, attempt, pct, stage))
+            trip_id = (result.get("trip") or {}).get("id")
+            values = dict(status="done", stage="done", progress=100, result=json.dumps(result), trip_id=trip_id)
+        except JobLost:
+            values = None
+        except Exception as e:
+            logger.exception("plan job %s failed", job_id)
+            values = dict(status="failed", stage="failed", error=str(e) or type(e).__name__)
+        finally:
+            stop.set()
+        if values is None or not self._update(job_id, attempt, **values):
+            logger.warning("plan job %s attempt %s lost the job to another worker; result dropped", job_id, attempt)
+
+def job_view(job: PlanJob) -> Dict:
+    out = {
+        "job_id": job.id,
+        "status": job.status,
+        "stage": job.stage,
+        "progress": job.progress,
+        "trip_id": job.trip_id,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+    }
+    if job.status == "done" and job.result:
+        out["result"] = json.loads(job.result)
+    return out
@@ -0,0 +1,48 @@
+from __future__ import annotations
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+STEP_MIN = 5  # knapsack resolution; visit lengths round up to it
+
+def pack(lengths: Sequence[int], scores: Sequence[float], capacity: int, max_items: int) -> List[int]:
+    """Indexes of the subset with the highest total score whose lengths fit capacity minutes.
+
+    0/1 knapsack with an item-count cap, solved by dynamic programming over
+    (items taken, minutes used) in STEP_MIN units. Each surviving candidate
+    is one vectorized update of a (max_items + 1) x (capacity / STEP_MIN + 1)
+    table; callers bound the candidate list to keep that flat for large
+    pools. Returned indexes are ascending."""
+    n = len(lengths)
+    width = max(capacity, 0) // STEP_MIN
+    if n == 0 or max_items <= 0:
+        return []
+    weights = [-(-length // STEP_MIN) for length in lengths]
+    # Of candidates with equal weight only the best min(max_items, width // w)
+    # can be in an optimum (a better one of the same weight can always be
+    # swapped in); durations take a handful of values, so this drops most
+    by_weight: Dict[int, List[int]] = {}
+    for i in sorted(range(n), key=lambda i: -scores[i]):
+        kept = by_weight.setdefault(weights[i], [])
+        if len(kept) < (min(max_items, width // weights[i]) if weights[i] else max_items):
+            kept.append(i)
+    live = sorted(i for kept in by_weight.values() for i in kept)
+    # best[c, w]: top score using exactly c items within w units
+    best = np.full((max_items + 1, width + 1), -np.inf)
+    best[0, :] = 0.0
+    took = np.zeros((len(live), max_items + 1, width + 1), dtype=bool)
+    for k, i in enumerate(live):
+        w, s = weights[i], scores[i]
+        taken = best[:-1, : width + 1 - w] + s  # a copy, so the update below stays 0/1
+        better = taken > best[1:, w:]
+        took[k, 1:, w:] = better
+        np.copyto(best[1:, w:], taken, where=better)
+    c = int(np.argmax(best[:, width]))
+    u = width
+    chosen = []
+    for k in range(len(live) - 1, -1, -1):
+        if c and took[k, c, u]:
+            chosen.append(live[k])
+            c -= 1
+            u -= weights[live[k]]
+    return chosen[::-1]
@@ -0,0 +1,133 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Sequence
+import sys
+
+import numpy as np
+from sqlalchemy import func
+from sqlmodel import Session, select
+from ..core.cache import TTLCache
+from ..core.catalog import catalog_version
+from ..models import Place
+
+COLUMNS = (Place.id, Place.city, Place.name, Place.category, Place.lat, Place.lng,
+           Place.rating, Place.price_level, Place.description, Place.hours)
+
+@dataclass(frozen=True, slots=True)
+class PlaceRef:
+    """Plain read-only row of a CityPlaces store; quacks like a Place for the planner"""
+    id: int
+    city: str
+    name: str
+    category: str
+    lat: float
+    lng: float
+    rating: float
+    price_level: int
+    description: str
+    hours: Optional[str] = None
+
+class CityPlaces:
+    """Columnar snapshot of one city's places.
+
+    Numeric fields are NumPy arrays and categories are small integer codes
+    into an interned table, so filtering and ranking are vectorized and no
+    ORM objects are built. Rows are materialized as PlaceRef only for the
+    places a caller actually picks."""
+
+    def __init__(self, rows: Sequence[tuple]):
+        n = len(rows)
+        self.city = rows[0][1] if n else ""
+        self.ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=n)
+        self.names: List[str] = [sys.intern(r[2]) for r in rows]
+        self.categories: List[str] = sorted({r[3] for r in rows})
+        code_of = {c: k for k, c in enumerate(self.categories)}
+        self.cat = np.fromiter((code_of[r[3]] for r in rows), dtype=np.int16, count=n)
+        self.lat = np.fromiter((r[4] for r in rows), dtype=np.float64, count=n)
+        self.lng = np.fromiter((r[5] for r in rows), dtype=np.float64, count=n)
+        self.rating = np.fromiter((r[6] for r in rows), dtype=np.float64, count=n)
+        self.price = np.fromiter((r[7] for r in rows), dtype=np.int8, count=n)
+        self.descriptions: List[str] = [r[8] for r in rows]
+        self.hours: List[Optional[str]] = [r[9] and sys.intern(r[9]) for r in rows]  # few distinct values
+        # Precomputed so rank() sorts by name without touching the strings
+        self.name_rank = np.empty(n, dtype=np.int32)
+        self.name_rank[sorted(range(n), key=self.names.__getitem__)] = np.arange(n, dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def mask(self, categories: Optional[Iterable[str]] = None, budget_level: Optional[int] = None) -> np.ndarray:
+        keep = np.ones(len(self), dtype=bool)
+        if categories:
+            codes = [k for k, c in enumerate(self.categories) if c in set(categories)]
+            keep &= np.isin(self.cat, codes)
+        if budget_level is not None:
+            keep &= self.price <= budget_level
+        return keep
+
+    def rank(self, keep: np.ndarray) -> np.ndarray:
+        """Row indexes passing keep, best first: rating desc, then price, then name"""
+        rows = np.flatnonzero(keep)
+        order = np.lexsort((self.name_rank[rows], self.price[rows], -self.rating[rows]))
+        return rows[order]
+
+    def pick(self, categories: Optional[Iterable[str]], count: int, budget_level: Optional[int]) -> List[PlaceRef]:
+        return self.refs(self.rank(self.mask(categories, budget_level))[: max(count, 0)])
+
+    def density(self, categories: Optional[Iterable[str]] = None, budget_level: Optional[int] = None) -> float:
+        """Summed rating of every place passing the filters, uncapped"""
+        return float(self.rating[self.mask(categories, budget_level)].sum())
+
+    def refs(self, rows: Iterable[int]) -> List[PlaceRef]:
+        return [PlaceRef(
+            int(self.ids[k]), self.city, self.names[k], self.categories[self.cat[k]],
+            float(self.lat[k]), float(self.lng[k]), float(self.rating[k]), int(self.price[k]),
+            self.descriptions[k], self.hours[k],
+        ) for k in rows]
+
+    def nbytes(self) -> int:
+        """Approximate heap footprint, including the string tables"""
+        arrays = sum(a.nbytes for a in (self.ids, self.cat, self.lat, self.lng, self.rating, self.price, self.name_rank))
+        strings = sum(sys.getsizeof(s) for s in self.names) + sum(sys.getsizeof(s) for s in self.descriptions)
+        return arrays + strings + sys.getsizeof(self.names) + sys.getsizeof(self.descriptions) + sys.getsizeof(self.hours)
+
+_stores = TTLCache(ttl=3600, maxsize=256)
+
+def city_places(session: Session, city: str) -> CityPlaces:
+    """Columnar store for a city (case-insensitive, ignoring a ", Country" suffix), cached per catalog version"""
+    city_norm = (city or "").split(",")[0].strip().lower()
+    key = (city_norm, catalog_version())
+    store = _stores.get(key)
+    if store is None:
+        rows = session.exec(select(*COLUMNS).where(func.lower(func.trim(Place.city)) == city_norm)).all()
+        store = CityPlaces(rows)
+        _stores.set(key, store)
+    return store
+
+_loose = TTLCache(ttl=3600, maxsize=256)
+
+def loose_pick(session: Session, city: str, count: int) -> List[PlaceRef]:
+    """Best places of any city whose name contains city (case-insensitive),
+    for destinations that match no catalog city exactly.
+
+    Filtered, ranked and limited in SQL so only the picked rows are read,
+    and cached per catalog version like the city stores."""
+    city_norm = (city or "").split(",")[0].strip().lower()
+    key = (city_norm, count, catalog_version())
+    picks = _loose.get(key)
+    if picks is None:
+        rows = session.exec(
+            select(*COLUMNS)
+            .where(func.lower(Place.city).contains(city_norm, autoescape=True))
+            .order_by(Place.rating.desc(), Place.price_level, Place.name)
+            .limit(max(count, 0))
+        ).all()
+        picks = [PlaceRef(*row) for row in rows]
+        _loose.set(key, picks)
+    return picks
+
+def hot_cities(session: Session, limit: int) -> List[str]:
+    """Normalized names of the cities with the most places"""
+    city = func.lower(func.trim(Place.city))
+    rows = session.exec(select(city).group_by(city).order_by(func.count(Place.id).desc()).limit(limit))
+    return list(rows)
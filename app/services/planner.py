@@ -1,12 +1,31 @@
 from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
 from dataclasses import dataclass
-from datetime import date, datetime, time, timedelta
-from typing import Dict, List, Optional, Tuple
+from datetime import date, time, timedelta
+from typing import Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import contextvars
 import math
+import random
+import threading
 
+import numpy as np
+
+from sqlalchemy import func
 from sqlmodel import Session, select
-from ..models import Place, ItineraryItem
+from ..core.cache import TTLCache
+from ..core.catalog import bump_catalog_version, catalog_version
+from ..core.config import settings
+from ..core.deadline import degrade, remaining
+from ..models import Place, ItineraryItem, ItineraryItemBase, Trip
+from .distances import Distance, DistanceMatrix, distance_fn, km_matrix, point_km
+from .geo import KDTree
 from .google_places import google_places_service
+from .packing import pack
+from .place_store import PlaceRef, city_places, hot_cities, loose_pick
+from .regions import MAX_REGIONS, Hub, Region, allocate_regions, known_hubs
+from .timeline import LUNCH_MIN, Intervals, clock, fit_day, hours_on, minutes
+from .weather import weather_service, rainy_days
 
 DURATIONS_MIN = {
     "sights": 120,
@@ -18,17 +37,26 @@ DURATIONS_MIN = {
     "activity": 90,
 }
 
+LUNCH_TITLE = "Lunch Break"
+LUNCH_PREFIX = "Lunch: "
+
 PACE_MULT = {"relaxed": 1.2, "standard": 1.0, "packed": 0.8}
 MAX_PER_DAY = {"relaxed": 5, "standard": 6, "packed": 8}
+TRAVEL_KMH = 15.0  # door-to-door pace between stops in a city; legs round up to 5 minutes
+PACK_WINDOW = 32  # best unused candidates considered per day; bounds the packing cost on big pools
+TRAVEL_ALLOWANCE_MIN = 10  # reserved per stop while packing, before the route and real legs are known
+MAX_ALTERNATIVES = 5
+DIVERSITY_PENALTY = 0.5  # score multiplier per earlier alternative that already visits a place
+ALTERNATIVE_JITTER = 0.15  # +/- relative noise on scores, seeded per alternative
 
-def haversine_km(a: Tuple[float, float], b: Tuple[float, float]) -> float:
-    R = 6371.0
-    lat1, lon1 = math.radians(a[0]), math.radians(a[1])
-    lat2, lon2 = math.radians(b[0]), math.radians(b[1])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    h = math.sin(dlat/2)**2 + math.cos(lat1)*math.cos(lat2)*math.sin(dlon/2)**2
-    return 2 * R * math.asin(math.sqrt(h))
+OUTDOOR_CATEGORIES = {"sights", "nature"}
+INDOOR_CATEGORIES = ["museum", "shopping"]
+FORECAST_HORIZON_DAYS = 5
+PLACE_KEY_DECIMALS = 5  # ~1 m: fetched places at the same rounded spot and name are one place
+FETCH_RESERVE_S = 0.5  # of the request deadline kept for scheduling once external calls are cut off
+
+_prefetch_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="plan-prefetch")
+_persist_lock = threading.Lock()
 
 @dataclass
 class PlanParams:
@@ -45,139 +73,604 @@ class PlanParams:
     name: Optional[str] = None
     use_google: bool = False
     country_mode: bool = False
+    weather_aware: bool = True
 
-def _pick_places(session: Session, city: str, interests: List[str], count: int, budget_level: Optional[int]) -> List[Place]:
+def _pick_places(session: Session, city: str, interests: List[str], count: int, budget_level: Optional[int]) -> List[PlaceRef]:
     """Pick places from DB with case-insensitive city matching and filters.
     If DB has none, return an empty list and let caller decide on fallback."""
-    q = select(Place)
-    places = session.exec(q).all()
-    # Case-insensitive city match and allow simple comma suffixes (e.g., "Paris, France")
-    city_norm = (city or "").split(",")[0].strip().lower()
-    places = [p for p in places if (p.city or "").strip().lower() == city_norm]
-    if interests:
-        places = [p for p in places if p.category in interests]
-    if budget_level is not None:
-        places = [p for p in places if p.price_level <= budget_level]
-    places.sort(key=lambda p: (-p.rating, p.price_level, p.name))
-    return places[: max(count, 0)]
-
-def _nearest_neighbor_order(points: List[Place]) -> List[Place]:
+    return city_places(session, city).pick(interests, count, budget_level)
+
+def _nearest_neighbor_order(points: List[Place], start=None, dist: Optional[Distance] = None) -> List[Place]:
+    """Greedy route through points, from the first one or from the stop nearest to start.
+
+    Pairwise distances come in one array (a matrix slice or one vectorized
+    haversine pass) and the route walks indexes; only a custom dist function
+    is called pair by pair."""
     if not points:
         return points
-    unvisited = points.copy()
-    route = [unvisited.pop(0)]
-    while unvisited:
-        last = route[-1]
-        unvisited.sort(key=lambda p: haversine_km((last.lat, last.lng), (p.lat, p.lng)))
-        route.append(unvisited.pop(0))
-    return route
-
-def _duration_for(category: str, pace: str) -> timedelta:
+    stops = points if start is None else [start] + list(points)
+    d = km_matrix(stops, dist or point_km)
+    if d is None:
+        unvisited = points.copy()
+        if start is not None:
+            unvisited.sort(key=lambda p: dist(start, p))
+        route = [unvisited.pop(0)]
+        while unvisited:
+            last = route[-1]
+            unvisited.sort(key=lambda p: dist(last, p))
+            route.append(unvisited.pop(0))
+        return route
+    visited = np.zeros(len(stops), dtype=bool)
+    visited[0] = True  # the start, or the first point when there is none
+    last = 0
+    order = [] if start is not None else [0]
+    while len(order) < len(points):
+        last = int(np.argmin(np.where(visited, np.inf, d[last])))
+        visited[last] = True
+        order.append(last)
+    return [stops[k] for k in order]
+
+def _duration_for(category: str, pace: str) -> int:
+    """Visit length in minutes"""
     base = DURATIONS_MIN.get(category, DURATIONS_MIN["activity"])
     mult = PACE_MULT.get(pace, 1.0)
-    return timedelta(minutes=int(base * mult))
+    return int(base * mult)
+
+def _travel(stops: List, dist: Distance) -> List[List[int]]:
+    """Leg minutes between every pair of stops; 0 to or from a stop without coordinates"""
+    located = [s.lat is not None and s.lng is not None for s in stops]
+    km = km_matrix(stops, dist) if all(located) else None
+    if km is not None:
+        return (5 * np.ceil(km / TRAVEL_KMH * 12)).astype(int).tolist()
+    return [[
+        5 * math.ceil(dist(a, b) / TRAVEL_KMH * 12) if i != j and located[i] and located[j] else 0
+        for j, b in enumerate(stops)
+    ] for i, a in enumerate(stops)]
+
+def _opening(stops: List, d: date, known: Optional[Dict[Tuple[float, float], Optional[str]]] = None) -> List[Optional[Intervals]]:
+    """Open intervals of each stop on d. Places carry their hours; itinerary
+    items are matched to a place by coordinates through known"""
+    out = []
+    for s in stops:
+        if isinstance(s, ItineraryItemBase):
+            out.append(hours_on((known or {}).get((s.lat, s.lng)), s.type, d.weekday()))
+        else:
+            out.append(hours_on(s.hours, s.category, d.weekday()))
+    return out
+
+def _prefetch_forecast(params: PlanParams, city: Optional[str] = None) -> Optional[Future]:
+    """Start the forecast fetch in the background so it overlaps the place queries"""
+    if not params.weather_aware or not weather_service.enabled:
+        return None
+    if params.start_date > date.today() + timedelta(days=FORECAST_HORIZON_DAYS):
+        return None
+    city = (city or params.destination).split(",")[0].strip()
+    # The prefetch thread runs under the caller's request deadline
+    return _prefetch_pool.submit(contextvars.copy_context().run, asyncio.run, weather_service.get_forecast(city))
+
+def _wet_days(params: PlanParams, pending: Optional[Future]) -> Set[date]:
+    if pending is None:
+        return set()
+    try:
+        forecast = pending.result(timeout=remaining(settings.weather_prefetch_timeout_s, FETCH_RESERVE_S))
+    except FutureTimeout:
+        degrade("weather")
+        return set()
+    except Exception:
+        # Weather is a nice-to-have; plan as if the sky is clear
+        return set()
+    return rainy_days(forecast, params.daily_start.hour, params.daily_end.hour)
+
+def _pack_day(candidates: List[Place], d: date, params: PlanParams, per_day: int, wet: bool,
+              bias: Optional[Dict[int, float]] = None) -> List[Place]:
+    """The candidates worth visiting on d: the subset with the most rating-weighted
+    minutes that fits the day's free time, at most per_day stops.
+
+    Candidates closed on d, or never open long enough within the day, are
+    left out. On wet days outdoor places count half, and bias (place id ->
+    multiplier) steers alternatives away from each other. Earlier candidates
+    win ties, so the pool's ranking still decides between equals."""
+    start, end = minutes(params.daily_start), minutes(params.daily_end)
+    keep: List[Place] = []
+    lengths: List[int] = []
+    scores: List[float] = []
+    for k, p in enumerate(candidates):
+        length = _duration_for(p.category, params.pace)
+        hours = hours_on(p.hours, p.category, d.weekday())
+        if hours is not None and not any(min(b, end) - max(a, start) >= length for a, b in hours):
+            continue
+        weight = 0.5 if wet and p.category in OUTDOOR_CATEGORIES else 1.0
+        if bias:
+            weight *= bias.get(p.id, 1.0)
+        keep.append(p)
+        lengths.append(length + TRAVEL_ALLOWANCE_MIN)
+        scores.append(p.rating * weight * length - k * 1e-6)
+    free = end - start + TRAVEL_ALLOWANCE_MIN  # the first stop has no leg
+    if params.lunch_at and start <= minutes(params.lunch_at) < end:
+        free -= LUNCH_MIN
+    return [keep[i] for i in pack(lengths, scores, free, per_day)]
+
+def _take_for_rain(pool: List[Place], indoor: List[Place], used: Set[int], count: int) -> List[Place]:
+    """Prefer non-outdoor picks from the pool, then indoor reserves, then outdoor fill"""
+    fresh = [p for p in pool if p.id not in used]
+    picks = [p for p in fresh if p.category not in OUTDOOR_CATEGORIES]
+    seen = {p.id for p in picks}
+    picks += [p for p in indoor if p.id not in used and p.id not in seen]
+    picks += [p for p in fresh if p.category in OUTDOOR_CATEGORIES]
+    return picks[:count]
 
-def _slot_next(curr: time, delta: timedelta) -> time:
-    dt = datetime.combine(date.today(), curr) + delta
-    return dt.time()
+def _timeline(stops: List, lengths: List[int], d: date, params: PlanParams, dist: Distance,
+              known: Optional[Dict[Tuple[float, float], Optional[str]]] = None, lunch_place=None,
+              ) -> Tuple[List[Optional[Tuple[time, time]]], Optional[Tuple[int, time, time]]]:
+    """Slot stops in order on day d, honouring opening hours and travel legs.
 
-def generate_plan(session: Session, params: PlanParams) -> Dict[str, List[ItineraryItem]]:
+    With a lunch_place (anything with coordinates), the legs into and out of
+    lunch are timed from it. Returns a (start, end) slot per stop, None for
+    stops that do not fit and, if lunch was inserted, (index of the stop it
+    precedes, start, end)."""
+    travel = _travel(stops + [lunch_place] if lunch_place is not None else stops, dist)
+    lunch_legs = None
+    if lunch_place is not None:
+        lunch_legs = [row[-1] for row in travel[:-1]], travel[-1][:-1]
+        travel = [row[:-1] for row in travel[:-1]]
+    slots, lunch = fit_day(
+        lengths, minutes(params.daily_start), minutes(params.daily_end),
+        minutes(params.lunch_at) if params.lunch_at else None,
+        _opening(stops, d, known), travel, lunch_legs,
+    )
+    return (
+        [(clock(s[0]), clock(s[1])) if s else None for s in slots],
+        (lunch[0], clock(lunch[1]), clock(lunch[2])) if lunch else None,
+    )
+
+def generate_plan(session: Session, params: PlanParams,
+                  progress: Optional[Callable[[int, str], None]] = None) -> Dict[str, List[ItineraryItemBase]]:
+    """Build the day-by-day schedule; progress(percent, stage) is called between phases"""
+    return generate_plans(session, params, 1, progress)[0]
+
+def generate_plans(session: Session, params: PlanParams, alternatives: int = 1,
+                   progress: Optional[Callable[[int, str], None]] = None) -> List[Dict[str, List[ItineraryItemBase]]]:
+    """Build one or more day-by-day schedules for the same request.
+
+    The first is the plan generate_plan returns. Further alternatives reuse
+    its place lookups, forecast and a distance matrix over the shared pool,
+    and only repeat the packing and routing, steered away from places the
+    earlier alternatives already visit."""
+    alternatives = max(1, min(alternatives, MAX_ALTERNATIVES))
+    report = progress or (lambda pct, stage: None)
     days = (params.end_date - params.start_date).days + 1
     if days <= 0:
         raise ValueError("end_date must be on/after start_date")
+    if params.country_mode:
+        report(5, "resolving regions")
+        hubs = _resolve_hubs(params.destination, max_hubs=min(days, MAX_REGIONS))
+        if hubs:
+            forecasts = {h.name: _prefetch_forecast(params, h.name) for h in hubs}
+            report(15, "fetching places")
+            regions = _plan_regions(session, params, hubs, days, alternatives)
+            if regions:
+                report(60, "scheduling")
+                wet = {r.hub: _wet_days(params, forecasts[r.hub]) for r in regions}
+                shared = {r.hub: _shared_distances(session, r.hub, r.pool, alternatives) for r in regions}
+                base = days * MAX_PER_DAY.get(params.pace, 6)
+                schedules = []
+                for bias in _alternative_biases(schedules, [p for r in regions for p in r.pool], alternatives):
+                    schedule: Dict[str, List[ItineraryItemBase]] = {}
+                    d = params.start_date
+                    for r in regions:
+                        dates = [d + timedelta(days=i) for i in range(r.days)]
+                        pool = r.pool if bias is not None else r.pool[:base]
+                        schedule.update(_schedule_days(session, r.hub, pool, dates, params, wet[r.hub],
+                                                       bias, shared[r.hub]))
+                        d += timedelta(days=r.days)
+                    schedules.append(schedule)
+                return schedules
+    report(10, "selecting places")
+    pending_forecast = _prefetch_forecast(params)
     total_needed = days * MAX_PER_DAY.get(params.pace, 6)
-    pool = _pick_places(session, params.destination, params.interests, total_needed, params.budget_level)
+    # Alternatives draw on a deeper pool; the first plan still only sees the top total_needed
+    pool_size = total_needed * alternatives
+    pool = _pick_places(session, params.destination, params.interests, pool_size, params.budget_level)
     # If nothing matched with filters, relax filters gradually
     if not pool:
-        pool = _pick_places(session, params.destination, [], total_needed, None)
+        pool = _pick_places(session, params.destination, [], pool_size, None)
     if not pool:
         # Loose city substring match ignoring filters
-        all_places = session.exec(select(Place)).all()
-        city_norm = (params.destination or "").split(",")[0].strip().lower()
-        loose = [p for p in all_places if city_norm in (p.city or "").strip().lower()]
-        loose.sort(key=lambda p: (-p.rating, p.price_level, p.name))
-        pool = loose[: max(total_needed, 0)]
+        pool = loose_pick(session, params.destination, pool_size)
     # Fallback: fetch from Google Places if DB has none, then persist lightweight entries
     if not pool or params.use_google or params.country_mode:
         # Try to fetch a small set per category of interest to diversify
-        fetched: List[Place] = []
+        if not params.interests:
+            params.interests = ["sights", "museum", "food", "nature", "shopping"]
+        radius = 150000 if params.country_mode else 50000
+        report(20, "fetching places")
+        fetched = _fetch_and_persist(session, [params.destination], _fetch_categories(params), radius, pool_size)
+        if fetched:
+            pool = _pick_places(session, params.destination, params.interests, pool_size, params.budget_level)
+    report(60, "scheduling")
+    dates = [params.start_date + timedelta(days=di) for di in range(days)]
+    wet = _wet_days(params, pending_forecast)
+    shared = _shared_distances(session, params.destination, pool, alternatives)
+    schedules: List[Dict[str, List[ItineraryItemBase]]] = []
+    for bias in _alternative_biases(schedules, pool, alternatives):
+        schedules.append(_schedule_days(session, params.destination, pool if bias is not None else pool[:total_needed],
+                                        dates, params, wet, bias, shared))
+    return schedules
+
+def _shared_distances(session: Session, city: str, pool: List[Place], alternatives: int) -> Optional[Distance]:
+    """One distance lookup for every alternative: the precomputed city matrix
+    if there is one, else a matrix over the pool built once here"""
+    dist = distance_fn(session, city)
+    if alternatives <= 1 or dist is not point_km or not pool:
+        return None
+    return DistanceMatrix.of(pool)
+
+def _alternative_biases(schedules: List[Dict[str, List[ItineraryItemBase]]], pool: List[Place], alternatives: int):
+    """Score multipliers per alternative: None for the first (the plain plan), then
+    seeded jitter times DIVERSITY_PENALTY for each earlier alternative visiting a
+    place. Reads schedules as the caller appends to it, so yield one at a time."""
+    by_coords = {(p.lat, p.lng): p.id for p in pool}
+    for k in range(alternatives):
+        if k == 0:
+            yield None
+            continue
+        rng = random.Random(k)
+        seen: Dict[int, int] = {}
+        for schedule in schedules:
+            for items in schedule.values():
+                for it in items:
+                    pid = by_coords.get((it.lat, it.lng))
+                    if pid is not None:
+                        seen[pid] = seen.get(pid, 0) + 1
+        yield {
+            p.id: DIVERSITY_PENALTY ** seen.get(p.id, 0) * (1 + rng.uniform(-ALTERNATIVE_JITTER, ALTERNATIVE_JITTER))
+            for p in pool
+        }
+
+def _run(coro):
+    """Run a coroutine from sync code (works both inside/outside an existing loop)"""
+    try:
+        return asyncio.run(coro)
+    except RuntimeError:
+        # If already in an event loop, create a new one
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+
+def _run_within_deadline(coro, step: str, default):
+    """_run(coro), cut off FETCH_RESERVE_S before the request deadline.
+
+    Returns default, and records step as degraded, when the budget is
+    spent; what the coroutine persisted before that is kept."""
+    left = remaining(reserve=FETCH_RESERVE_S)
+    if left is None:
+        return _run(coro)
+    if left <= 0:
+        coro.close()
+        degrade(step)
+        return default
+    try:
+        return _run(asyncio.wait_for(coro, left))
+    except asyncio.TimeoutError:
+        degrade(step)
+        return default
+
+async def _fetch_google(cities: List[str], interests: List[str], radius: int,
+                        on_page: Callable[[str, List[Dict]], None], enough: Callable[[str], bool]) -> None:
+    """Fetch every city x category concurrently, handing each result page to on_page as it arrives.
+
+    Upstream requests share one GOOGLE_MAX_CONCURRENCY semaphore. Every
+    category's first page is always fetched so the interest mix is kept;
+    follow-up pages only while enough(city) is False."""
+    limit = asyncio.Semaphore(max(settings.google_max_concurrency, 1))
+
+    async def crawl(city: str, cat: str):
         try:
-            import asyncio
-            async def fetch_all():
-                out = []
-                if not params.interests:
-                    params.interests = ["sights", "museum", "food", "nature", "shopping"]
-                radius = 150000 if params.country_mode else 50000
-                tasks = [google_places_service.search_places(params.destination, cat, radius=radius) for cat in params.interests]
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-                for r in results:
-                    if isinstance(r, list):
-                        out.extend(r)
-                return out
-            # Run event loop (works both inside/outside existing loop)
-            try:
-                fetched_raw = asyncio.run(fetch_all())
-            except RuntimeError:
-                # If already in an event loop, create a new one
-                loop = asyncio.new_event_loop()
-                fetched_raw = loop.run_until_complete(fetch_all())
-                loop.close()
-            # Deduplicate by name and map to Place rows, then persist
-            seen = set()
-            for pr in fetched_raw:
-                key = (pr.get("name"), pr.get("lat"), pr.get("lng"))
+            async for page in google_places_service.iter_places(city, cat, radius=radius, limit=limit,
+                                                                more=lambda: not enough(city)):
+                on_page(city, page)
+        except Exception:
+            degrade("places")
+            raise
+
+    await asyncio.gather(*(crawl(city, cat) for city in cities for cat in interests), return_exceptions=True)
+
+def _fetch_categories(params: PlanParams) -> List[str]:
+    """Interests to fetch, plus food when lunch stops need real places"""
+    cats = list(params.interests or ["sights", "museum", "food", "nature", "shopping"])
+    if params.lunch_at and "food" not in cats:
+        cats.append("food")
+    return cats
+
+def _place_key(name: str, lat: float, lng: float) -> Tuple[str, float, float]:
+    """Identity of a fetched place: same-named branches of a chain stay apart"""
+    return name, round(lat, PLACE_KEY_DECIMALS), round(lng, PLACE_KEY_DECIMALS)
+
+def _fetch_and_persist(session: Session, cities: List[str], interests: List[str], radius: int,
+                       need: Optional[int] = None) -> Dict[str, List[Place]]:
+    """Fetch places from Google for each city, persist new ones and return them per city.
+
+    Pages are deduplicated and upserted as they arrive; once a city has need
+    distinct places (None: no limit) its remaining result pages are skipped.
+    Places already in the catalog (same city, name and location, with the
+    city matched as the pool matches it) are reused rather than inserted
+    again; the lock keeps concurrent plans for one city from both inserting
+    the rows a shared fetch returned."""
+    fetched: Dict[str, Dict[Tuple[str, float, float], Place]] = {}
+    added = 0
+
+    def persist(city: str, raw: List[Dict]):
+        nonlocal added
+        city_name = city.split(",")[0].strip()
+        seen = fetched.setdefault(city, {})
+        keyed = [(_place_key(pr.get("name", ""), float(pr.get("lat", 0.0)), float(pr.get("lng", 0.0))), pr) for pr in raw]
+        names = {key[0] for key, _ in keyed if key not in seen}
+        if not names:
+            return
+        with _persist_lock:
+            existing = {_place_key(p.name, p.lat, p.lng): p for p in session.exec(
+                select(Place).where(func.lower(func.trim(Place.city)) == city_name.lower(), Place.name.in_(names)))}
+            # Deduplicate by name and location and map to Place rows, then persist
+            fresh = 0
+            for key, pr in keyed:
                 if key in seen:
                     continue
-                seen.add(key)
-                p = Place(
-                    city=params.destination.split(",")[0].strip(),
-                    name=pr.get("name", ""),
-                    category=pr.get("category", "activity"),
-                    lat=float(pr.get("lat", 0.0)),
-                    lng=float(pr.get("lng", 0.0)),
-                    rating=float(pr.get("rating", 4.5)),
-                    price_level=int(pr.get("price_level", 2)),
-                    description=pr.get("description", "")
-                )
-                session.add(p)
-                fetched.append(p)
-            if fetched:
+                p = existing.get(key)
+                if p is None:
+                    p = Place(
+                        city=city_name,
+                        name=key[0],
+                        category=pr.get("category", "activity"),
+                        lat=float(pr.get("lat", 0.0)),
+                        lng=float(pr.get("lng", 0.0)),
+                        rating=float(pr.get("rating", 4.5)),
+                        price_level=int(pr.get("price_level", 2)),
+                        description=pr.get("description", "")
+                    )
+                    session.add(p)
+                    fresh += 1
+                seen[key] = p
+            if fresh:
                 session.commit()
-                pool = _pick_places(session, params.destination, params.interests, total_needed, params.budget_level)
+                added += fresh
+
+    def enough(city: str) -> bool:
+        return need is not None and len(fetched.get(city, ())) >= need
+
+    try:
+        _run_within_deadline(_fetch_google(cities, interests, radius, persist, enough), "places", None)
+    except Exception:
+        # Silent fallback; callers keep whatever the DB had plus the pages persisted so far
+        session.rollback()
+    finally:
+        if added:
+            bump_catalog_version()
+    return {city: list(places.values()) for city, places in fetched.items() if places}
+
+def _resolve_hubs(destination: str, max_hubs: int) -> List[Hub]:
+    """Known hubs for the country, else ask Google for its major cities.
+
+    Fewer than two hubs means the input is not really a country; the caller
+    then falls back to a single wide-radius search."""
+    hubs = known_hubs(destination, max_hubs)
+    if not hubs and google_places_service.enabled:
+        try:
+            found = _run_within_deadline(google_places_service.search_hub_cities(destination), "hubs", [])
         except Exception:
-            # Silent fallback; keep pool empty if fetch fails
-            pass
+            found = []
+        hubs = [Hub(h["name"], h["lat"], h["lng"]) for h in found][:max_hubs]
+    return hubs if len(hubs) >= 2 else []
+
+def _plan_regions(session: Session, params: PlanParams, hubs: List[Hub], days: int, alternatives: int = 1) -> List[Region]:
+    """Split a country trip across hub cities, fetching missing regions in parallel"""
+    base = days * MAX_PER_DAY.get(params.pace, 6)
+    per_region = base * alternatives
+    interests = params.interests or ["sights", "museum", "food", "nature", "shopping"]
+    pools = {h.name: _pick_places(session, h.name, interests, per_region, params.budget_level) for h in hubs}
+    missing = [h.name for h in hubs if params.use_google or not pools[h.name]]
+    if missing and google_places_service.enabled:
+        fetched = _fetch_and_persist(session, missing, _fetch_categories(params), 50000, per_region)
+        for city in fetched:
+            pools[city] = _pick_places(session, city, interests, per_region, params.budget_level)
+    # Days follow everything each hub offers, not the capped pools, and are
+    # allocated once so every alternative visits the same regions
+    density = {name: city_places(session, name).density(interests, params.budget_level) for name in pools}
+    regions = allocate_regions(hubs, {name: pool[:base] for name, pool in pools.items()}, days, density)
+    for r in regions:
+        r.pool = pools[r.hub]
+    return regions
+
+def _schedule_days(session: Session, city: str, pool: List[Place], dates: List[date], params: PlanParams,
+                   wet: Set[date], bias: Optional[Dict[int, float]] = None,
+                   dist: Optional[Distance] = None) -> Dict[str, List[ItineraryItemBase]]:
     per_day = MAX_PER_DAY.get(params.pace, 6)
-    schedule: Dict[str, List[ItineraryItem]] = {}
-    idx = 0
-    for di in range(days):
-        d = params.start_date + timedelta(days=di)
+    # Rainy days swap outdoor stops for indoor ones, even outside the chosen interests
+    indoor = _pick_places(session, city, INDOOR_CATEGORIES, per_day * len(dates), params.budget_level) if wet else []
+    food = _food_index(session, city, params.budget_level) if params.lunch_at else None
+    dist = dist or distance_fn(session, city)
+    schedule: Dict[str, List[ItineraryItemBase]] = {}
+    used: Set[int] = set()
+    for d in dates:
         day_key = d.isoformat()
-        todays = pool[idx : idx + per_day]
-        idx += len(todays)
-        todays = _nearest_neighbor_order(todays)
-        t = params.daily_start
-        day_items: List[ItineraryItem] = []
-        lunch_added = False
-        for p in todays:
-            dur = _duration_for(p.category, params.pace)
-            end_t = _slot_next(t, dur)
-            if params.lunch_at and not lunch_added and t <= params.lunch_at <= end_t:
-                lunch_end = _slot_next(params.lunch_at, timedelta(minutes=60))
-                day_items.append(ItineraryItem(
-                    trip_id=0, day=d, title="Lunch Break", type="food",
-                    location_name="TBD", start_time=params.lunch_at, end_time=lunch_end
-                ))
-                t = lunch_end
-                end_t = _slot_next(t, dur)
-                lunch_added = True
-            if end_t > params.daily_end:
-                break
-            day_items.append(ItineraryItem(
+        if d in wet:
+            candidates = _take_for_rain(pool, indoor, used, PACK_WINDOW)
+        elif bias:
+            fresh = [p for p in pool if p.id not in used]
+            candidates = sorted(fresh, key=lambda p: -p.rating * bias.get(p.id, 1.0))[:PACK_WINDOW]
+        else:
+            candidates = [p for p in pool if p.id not in used][:PACK_WINDOW]
+        # Candidates not packed today stay unused for the following days
+        todays = _nearest_neighbor_order(_pack_day(candidates, d, params, per_day, d in wet, bias), dist=dist)
+        slots, lunch = _timeline(todays, [_duration_for(p.category, params.pace) for p in todays], d, params, dist)
+        lunch_place = None
+        if lunch and food is not None and todays:
+            k = lunch[0]
+            anchor = todays[k - 1] if k > 0 else todays[0]
+            # Picks that did not fit the day are still free for lunch
+            fitted = {p.id for p, slot in zip(todays, slots) if slot}
+            lunch_place = food.nearest(anchor.lat, anchor.lng, lambda p: p.id not in used and p.id not in fitted)
+            if lunch_place is not None:
+                # The afternoon route continues from the lunch spot; the morning is unchanged
+                afternoon = [p for p in todays[k:] if p.id != lunch_place.id]
+                rerouted = todays[:k] + _nearest_neighbor_order(afternoon, start=lunch_place, dist=dist)
+                trial = _timeline(rerouted, [_duration_for(p.category, params.pace) for p in rerouted], d, params, dist,
+                                  lunch_place=lunch_place)
+                if trial[1]:
+                    todays, (slots, lunch) = rerouted, trial
+                    used.add(lunch_place.id)
+                else:
+                    # With the detour there is no room for lunch: keep the first timeline and a plain break
+                    lunch_place = None
+        day_items: List[ItineraryItemBase] = []
+        for k, (p, slot) in enumerate(zip(todays, slots)):
+            if lunch and lunch[0] == k:
+                day_items.append(_lunch_item(d, lunch, lunch_place))
+            if slot is None:
+                continue  # closed or no room today; stays in the pool for later days
+            used.add(p.id)
+            day_items.append(ItineraryItemBase(
                 trip_id=0, day=d, title=p.name, type=p.category,
                 location_name=p.name, lat=p.lat, lng=p.lng,
-                start_time=t, end_time=end_t, notes=p.description
+                start_time=slot[0], end_time=slot[1], notes=p.description
             ))
-            t = end_t
+        if lunch and lunch[0] == len(todays):
+            day_items.append(_lunch_item(d, lunch, lunch_place))
         schedule[day_key] = day_items
     return schedule
+
+def _lunch_item(d: date, lunch: Tuple[int, time, time], place: Optional[Place] = None) -> ItineraryItemBase:
+    if place is None:
+        return ItineraryItemBase(
+            trip_id=0, day=d, title=LUNCH_TITLE, type="food",
+            location_name="TBD", start_time=lunch[1], end_time=lunch[2]
+        )
+    return ItineraryItemBase(
+        trip_id=0, day=d, title=f"{LUNCH_PREFIX}{place.name}", type="food",
+        location_name=place.name, lat=place.lat, lng=place.lng,
+        start_time=lunch[1], end_time=lunch[2], notes=place.description
+    )
+
+def _is_lunch(item: ItineraryItem) -> bool:
+    return item.title == LUNCH_TITLE or item.title.startswith(LUNCH_PREFIX)
+
+_food_indexes = TTLCache(ttl=3600, maxsize=256)
+
+def _food_index(session: Session, city: str, budget_level: Optional[int]) -> Optional[KDTree]:
+    """Spatial index of a city's food places within budget, cached per catalog version"""
+    city_norm = (city or "").split(",")[0].strip().lower()
+    key = (city_norm, budget_level, catalog_version())
+    index = _food_indexes.get(key)
+    if index is None:
+        store = city_places(session, city)
+        food = store.refs(np.flatnonzero(store.mask(["food"], budget_level)))
+        index = KDTree(food) if food else False
+        _food_indexes.set(key, index)
+    return index or None
+
+def warm_up(session: Session, limit: int) -> List[str]:
+    """Build the columnar stores, lunch indexes and distance lookups of the hottest cities.
+
+    One offline dry-run plan also warms SQL compilation and the scheduling
+    code paths, which otherwise dominate the first real request."""
+    cities = hot_cities(session, limit)
+    for city in cities:
+        city_places(session, city)
+        _food_index(session, city, None)
+        distance_fn(session, city)
+    if cities:
+        today = date.today()
+        generate_plan(session, PlanParams(destination=cities[0], start_date=today, end_date=today + timedelta(days=1),
+                                          interests=list(DURATIONS_MIN), weather_aware=False))
+    return cities
+
+def replan_day(session: Session, trip: Trip, day: date, params: PlanParams, backfill: bool = False) -> Tuple[List[ItineraryItem], int, int]:
+    """Re-route and re-time one day of a saved trip in place.
+
+    Stops with coordinates are reordered by nearest neighbour and slotted like
+    generate_plan; stops without coordinates follow them. Stops that no longer
+    fit before daily_end lose their times. With backfill, free time at the end
+    of the day is filled with the nearest unused catalog places that fit.
+    Returns (ordered items, changed rows, added rows); only those rows are written."""
+    items = session.exec(
+        select(ItineraryItem).where(ItineraryItem.trip_id == trip.id, ItineraryItem.day == day)
+    ).all()
+    before = {i.id: (i.start_time, i.end_time) for i in items}
+    lunch_rows = [i for i in items if _is_lunch(i)]
+    lunch_row = lunch_rows[0] if lunch_rows else None
+    stops = [i for i in items if i is not lunch_row]
+    city = trip.destination or params.destination
+    dist = distance_fn(session, city)
+    routed = _nearest_neighbor_order([i for i in stops if i.lat is not None and i.lng is not None], dist=dist)
+    stops = routed + sorted(
+        (i for i in stops if i.lat is None or i.lng is None),
+        key=lambda i: (i.start_time is None, i.start_time or time.min, i.title),
+    )
+    durations = [_item_duration(i, params.pace) for i in stops]
+    # A lunch already booked at a place times the legs to and from it
+    lunch_at_place = lunch_row if lunch_row is not None and lunch_row.lat is not None and lunch_row.lng is not None else None
+    store = city_places(session, city)
+    known = {(lat, lng): h for lat, lng, h in zip(store.lat.tolist(), store.lng.tolist(), store.hours) if h}
+
+    added: List[ItineraryItem] = []
+    if backfill:
+        taken = {name for row in session.exec(
+            select(ItineraryItem.title, ItineraryItem.location_name).where(ItineraryItem.trip_id == trip.id)
+        ).all() for name in row}
+        candidates = [p for p in _pick_places(session, city, params.interests,
+                                              MAX_PER_DAY.get(params.pace, 6) * 4, params.budget_level)
+                      if p.name not in taken]
+        slots, _ = _timeline(stops, durations, day, params, dist, known, lunch_at_place)
+        while candidates and all(slots):
+            last = stops[-1] if stops else None
+            if last is not None and last.lat is not None and last.lng is not None:
+                candidates.sort(key=lambda p: dist(last, p))
+            p = candidates.pop(0)
+            dur = _duration_for(p.category, params.pace)
+            trial, _ = _timeline(stops + [p], durations + [dur], day, params, dist, known, lunch_at_place)
+            if not all(trial):
+                continue
+            new = ItineraryItem(
+                trip_id=trip.id, day=day, title=p.name, type=p.category,
+                location_name=p.name, lat=p.lat, lng=p.lng, notes=p.description
+            )
+            stops.append(new)
+            durations.append(dur)
+            added.append(new)
+            slots = trial
+
+    slots, lunch = _timeline(stops, durations, day, params, dist, known, lunch_at_place)
+    ordered: List[ItineraryItem] = []
+    for k, stop in enumerate(stops):
+        if lunch and lunch[0] == k:
+            lunch_row = _place_lunch(lunch_row, trip.id, day, lunch)
+            ordered.append(lunch_row)
+        stop.start_time, stop.end_time = slots[k] or (None, None)
+        ordered.append(stop)
+    if lunch and lunch[0] == len(stops):
+        lunch_row = _place_lunch(lunch_row, trip.id, day, lunch)
+        ordered.append(lunch_row)
+    elif lunch_row is not None and lunch_row not in ordered:
+        ordered.append(lunch_row)
+
+    changed = [i for i in ordered if i.id is not None and before.get(i.id) != (i.start_time, i.end_time)]
+    fresh = [i for i in ordered if i.id is None]
+    for i in changed + fresh:
+        session.add(i)
+    if changed or fresh:
+        session.commit()
+    return ordered, len(changed), len(fresh)
+
+def _item_duration(item: ItineraryItem, pace: str) -> int:
+    """Keep a user-set duration; fall back to the category default"""
+    if item.start_time and item.end_time and item.end_time > item.start_time:
+        return minutes(item.end_time) - minutes(item.start_time)
+    return _duration_for(item.type, pace)
+
+def _place_lunch(row: Optional[ItineraryItem], trip_id: int, d: date, lunch: Tuple[int, time, time]) -> ItineraryItem:
+    if row is None:
+        row = ItineraryItem(**_lunch_item(d, lunch).model_dump())
+        row.trip_id = trip_id
+    row.start_time, row.end_time = lunch[1], lunch[2]
+    return row
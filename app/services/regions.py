@@ -0,0 +1,85 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional
+import json
+import os
+
+from .geo import haversine_km
+
+MAX_REGIONS = 5
+HUBS_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "data", "country_hubs.json")
+COUNTRY_ALIASES = {
+    "usa": "united states", "us": "united states", "united states of america": "united states",
+    "uk": "united kingdom", "england": "united kingdom", "great britain": "united kingdom",
+}
+
+@dataclass
+class Hub:
+    name: str
+    lat: float
+    lng: float
+
+@dataclass
+class Region:
+    hub: str
+    lat: float
+    lng: float
+    pool: list = field(default_factory=list)
+    days: int = 0
+    density: float = 0.0
+
+@lru_cache(maxsize=1)
+def _known_hubs() -> Dict[str, List[Hub]]:
+    try:
+        with open(HUBS_PATH, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    except OSError:
+        return {}
+    return {country: [Hub(*h) for h in hubs] for country, hubs in raw.items()}
+
+def known_hubs(destination: str, max_hubs: int = MAX_REGIONS) -> List[Hub]:
+    """Hub cities for a country from data/country_hubs.json, entry city first"""
+    key = (destination or "").split(",")[-1].strip().lower()
+    key = COUNTRY_ALIASES.get(key, key)
+    return _known_hubs().get(key, [])[:max(max_hubs, 0)]
+
+def allocate_regions(hubs: List[Hub], pools: Dict[str, list], days: int,
+                     density: Optional[Dict[str, float]] = None) -> List[Region]:
+    """Give each region days in proportion to its interest density, in route order.
+
+    Density is the summed rating of places matching the trip's interests, so
+    a hub with many well-rated matches gets more days. Pass density when the
+    pools are capped selections; otherwise it is summed over the pools. With
+    fewer days than regions only the densest regions are kept. Regions are
+    then chained by nearest neighbour starting from the first (entry) hub."""
+    regions = [Region(h.name, h.lat, h.lng, pools.get(h.name, []), 0,
+                      density[h.name] if density is not None and h.name in density
+                      else sum(p.rating for p in pools.get(h.name, [])))
+               for h in hubs]
+    regions = [r for r in regions if r.pool]
+    if not regions or days <= 0:
+        return []
+    if days < len(regions):
+        keep = sorted(regions, key=lambda r: -r.density)[:days]
+        regions = [r for r in regions if r in keep]
+    total = sum(r.density for r in regions)
+    spare = days - len(regions)
+    # No rated matches anywhere (fresh hubs, missing ratings): split the spare days evenly
+    shares = [spare * r.density / total if total > 0 else spare / len(regions) for r in regions]
+    for r, share in zip(regions, shares):
+        r.days = 1 + int(share)
+    # Largest remainder for the days lost to rounding down
+    leftover = days - sum(r.days for r in regions)
+    for i in sorted(range(len(regions)), key=lambda i: -(shares[i] - int(shares[i])))[:leftover]:
+        regions[i].days += 1
+    return _route_order(regions)
+
+def _route_order(regions: List[Region]) -> List[Region]:
+    route = [regions[0]]
+    rest = regions[1:]
+    while rest:
+        last = route[-1]
+        rest.sort(key=lambda r: haversine_km((last.lat, last.lng), (r.lat, r.lng)))
+        route.append(rest.pop(0))
+    return route
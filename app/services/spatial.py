@@ -0,0 +1,114 @@
+from __future__ import annotations
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+import math
+
+from sqlmodel import Session, select
+from ..core.cache import TTLCache
+from ..core.catalog import catalog_version
+from ..models import Place
+
+# Grid level L splits the world into 2**L columns of 360 / 2**L degrees.
+# Map zoom z is rendered with 4x4 cells per 256px tile, i.e. level z + 2.
+CELLS_PER_TILE_LOG2 = 2
+BASE_LEVEL = 18  # ~150 m cells; finer zooms reuse base cells
+BASE_COLUMNS = 1 << BASE_LEVEL
+MAX_ZOOM = BASE_LEVEL - CELLS_PER_TILE_LOG2
+
+Top = Tuple[float, int, str, str, float, float]  # rating, id, name, category, lat, lng
+
+@dataclass
+class CellAgg:
+    count: int = 0
+    sum_lat: float = 0.0
+    sum_lng: float = 0.0
+    top: Optional[Top] = None
+
+    def add(self, count: int, sum_lat: float, sum_lng: float, top: Optional[Top]):
+        self.count += count
+        self.sum_lat += sum_lat
+        self.sum_lng += sum_lng
+        if top is not None and (self.top is None or top[0] > self.top[0]):
+            self.top = top
+
+def cell_deg(level: int) -> float:
+    return 360.0 / (1 << level)
+
+def base_cell(lat: float, lng: float) -> Tuple[int, int]:
+    size = cell_deg(BASE_LEVEL)
+    return int(math.floor((lng + 180.0) / size)), int(math.floor((lat + 90.0) / size))
+
+@dataclass
+class PlaceGridIndex:
+    """Places pre-aggregated into base grid cells, per category.
+
+    Queries at any zoom roll base cells up by bit-shifting their keys, so the
+    cost is proportional to the number of non-empty base cells in view rather
+    than the number of places. Non-empty rows and, per row, non-empty columns
+    are kept sorted so a bbox is resolved by bisection without touching the
+    cells outside it."""
+    cells: Dict[Tuple[int, int], Dict[str, CellAgg]] = field(default_factory=dict)
+    ys: List[int] = field(default_factory=list)  # non-empty rows, ascending
+    xs: Dict[int, List[int]] = field(default_factory=dict)  # non-empty columns per row, ascending
+
+    @classmethod
+    def build(cls, rows) -> "PlaceGridIndex":
+        index = cls()
+        for pid, name, category, lat, lng, rating in rows:
+            by_cat = index.cells.setdefault(base_cell(lat, lng), {})
+            by_cat.setdefault(category, CellAgg()).add(1, lat, lng, (rating, pid, name, category, lat, lng))
+        for x, y in index.cells:
+            index.xs.setdefault(y, []).append(x)
+        for row in index.xs.values():
+            row.sort()
+        index.ys = sorted(index.xs)
+        return index
+
+    def in_view(self, bbox: Tuple[float, float, float, float]) -> Iterator[Tuple[int, int]]:
+        """Non-empty base cells in min_lng,min_lat,max_lng,max_lat; min_lng > max_lng crosses the antimeridian"""
+        min_lng, min_lat, max_lng, max_lat = bbox
+        x0, y0 = base_cell(min_lat, min_lng)
+        x1, y1 = base_cell(max_lat, max_lng)
+        spans = [(x0, x1)] if min_lng <= max_lng else [(x0, BASE_COLUMNS - 1), (0, x1)]
+        for y in self.ys[bisect_left(self.ys, y0): bisect_right(self.ys, y1)]:
+            row = self.xs[y]
+            for a, b in spans:
+                for x in row[bisect_left(row, a): bisect_right(row, b)]:
+                    yield x, y
+
+    def clusters(self, zoom: int, bbox: Optional[Tuple[float, float, float, float]] = None,
+                 category: Optional[str] = None) -> List[Dict]:
+        level = min(max(zoom, 0) + CELLS_PER_TILE_LOG2, BASE_LEVEL)
+        shift = BASE_LEVEL - level
+        keys = self.in_view(bbox) if bbox else self.cells.keys()
+        out: Dict[Tuple[int, int], CellAgg] = {}
+        for cx, cy in keys:
+            by_cat = self.cells[(cx, cy)]
+            aggs = [by_cat[category]] if category in by_cat else ([] if category else by_cat.values())
+            for a in aggs:
+                out.setdefault((cx >> shift, cy >> shift), CellAgg()).add(a.count, a.sum_lat, a.sum_lng, a.top)
+        clusters = []
+        for (gx, gy), a in out.items():
+            rating, pid, name, cat, lat, lng = a.top
+            clusters.append({
+                "cell": [gx, gy],
+                "lat": a.sum_lat / a.count,
+                "lng": a.sum_lng / a.count,
+                "count": a.count,
+                "top": {"id": pid, "name": name, "category": cat, "rating": rating, "lat": lat, "lng": lng},
+            })
+        clusters.sort(key=lambda c: -c["count"])
+        return clusters
+
+_indexes = TTLCache(ttl=3600, maxsize=2)
+
+def grid_index(session: Session) -> PlaceGridIndex:
+    """Grid index for the current catalog version, built from a narrow column query"""
+    version = catalog_version()
+    index = _indexes.get(version)
+    if index is None:
+        rows = session.exec(select(Place.id, Place.name, Place.category, Place.lat, Place.lng, Place.rating)).all()
+        index = PlaceGridIndex.build(rows)
+        _indexes.set(version, index)
+    return index
@@ -0,0 +1,148 @@
+from __future__ import annotations
+from datetime import time
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
+import logging
+
+# Integer-minute day timeline. Times are minutes after midnight (0..1440) so
+# fitting a stop is a few int comparisons instead of datetime arithmetic.
+#
+# Opening hours are stored on Place.hours as a compact string: seven
+# "|"-separated fields, Monday first, each a comma list of HHMM-HHMM
+# intervals. An empty field is a closed day; a string without "|" applies to
+# every day; a close at or before the open runs past midnight and is cut at
+# 24:00. NULL means unknown, i.e. no constraint.
+#   "1000-1800"                       10:00-18:00 daily
+#   "|1000-1800|1000-1800|1000-1800|1000-2100|1000-1800|1000-1800"
+#                                     closed Mondays, late on Thursdays
+#   "0800-1200,1400-1900"             closed over lunch
+
+DAY_MIN = 24 * 60
+LUNCH_MIN = 60
+
+logger = logging.getLogger("travel_planner.timeline")
+
+Interval = Tuple[int, int]
+Intervals = Tuple[Interval, ...]
+Week = Tuple[Intervals, ...]  # 7 entries, Monday first
+Slot = Optional[Tuple[int, int]]
+Lunch = Optional[Tuple[int, int, int]]  # index of the stop it precedes, start, end
+
+# Used when a place has no hours of its own
+CATEGORY_HOURS = {
+    "museum": "1000-1800",
+    "shopping": "1000-2000",
+}
+
+def minutes(t: time) -> int:
+    return t.hour * 60 + t.minute
+
+def clock(m: int) -> time:
+    m = min(max(m, 0), DAY_MIN - 1)
+    return time(m // 60, m % 60)
+
+def _interval(text: str) -> Interval:
+    a, b = text.strip().split("-")
+    start, end = int(a[:2]) * 60 + int(a[2:]), int(b[:2]) * 60 + int(b[2:])
+    if not (0 <= start < DAY_MIN and 0 <= end <= DAY_MIN):
+        raise ValueError(text)
+    return start, end if end > start else DAY_MIN
+
+@lru_cache(maxsize=4096)
+def parse_hours(spec: Optional[str]) -> Optional[Week]:
+    """Week of open intervals for a Place.hours string; None if unknown or malformed"""
+    if not spec or not spec.strip():
+        return None
+    fields = spec.split("|")
+    if len(fields) == 1:
+        fields *= 7
+    if len(fields) != 7:
+        logger.warning("ignoring opening hours %r: expected 1 or 7 fields", spec)
+        return None
+    try:
+        return tuple(
+            tuple(sorted(_interval(iv) for iv in field.split(",") if iv.strip()))
+            for field in fields
+        )
+    except ValueError:
+        logger.warning("ignoring malformed opening hours %r", spec)
+        return None
+
+def format_hours(week: Week) -> str:
+    fields = [",".join(f"{a // 60:02d}{a % 60:02d}-{b // 60:02d}{b % 60:02d}" for a, b in day) for day in week]
+    return fields[0] if len(set(fields)) == 1 else "|".join(fields)
+
+def hours_on(spec: Optional[str], category: str, weekday: int) -> Optional[Intervals]:
+    """Open intervals of a place on a weekday (0 = Monday); None when unconstrained"""
+    week = parse_hours(spec or CATEGORY_HOURS.get(category))
+    return None if week is None else week[weekday]
+
+def earliest_start(open_at: Optional[Intervals], arrival: int, length: int, day_end: int) -> Optional[int]:
+    """First start at or after arrival where the whole visit fits an open interval and the day"""
+    if open_at is None:
+        return arrival if arrival + length <= day_end else None
+    for a, b in open_at:
+        start = arrival if arrival > a else a
+        if start + length <= (b if b < day_end else day_end):
+            return start
+    return None
+
+def fit_day(
+    lengths: Sequence[int],
+    day_start: int,
+    day_end: int,
+    lunch_at: Optional[int] = None,
+    hours: Optional[Sequence[Optional[Intervals]]] = None,
+    travel: Optional[Sequence[Sequence[int]]] = None,
+    lunch_legs: Optional[Tuple[Sequence[int], Sequence[int]]] = None,
+) -> Tuple[List[Slot], Lunch]:
+    """Slot stops in order from day_start, in minutes.
+
+    A stop waits for its place to open, and is skipped (slot None) when it
+    cannot fit an open interval before day_end; later stops still get their
+    chance. travel[i][j] is the leg from stop i to stop j, taken before each
+    stop but the first. Lunch is inserted, once, when the wait, leg or visit
+    of a stop would run past lunch_at; it goes after the stop instead when
+    the stop only fits before it, so lunch can be the last entry (index
+    len(lengths)). When lunch is at a known place, lunch_legs = (to, from)
+    gives the legs to[i] from stop i to it and from[j] from it to stop j;
+    otherwise the leg after lunch is timed from the stop before it. All
+    plain ints: this runs for every day of every plan and batch job."""
+    slots: List[Slot] = [None] * len(lengths)
+    lunch: Lunch = None
+    t = day_start
+    prev = -1
+    at_lunch = False  # coming from the lunch place rather than from stop prev
+    for k, length in enumerate(lengths):
+        open_at = hours[k] if hours is not None else None
+        if at_lunch:
+            leg = lunch_legs[1][k]
+        else:
+            leg = travel[prev][k] if travel is not None and prev >= 0 else 0
+        start = earliest_start(open_at, t + leg, length, day_end)
+        if lunch_at is not None and lunch is None and t <= lunch_at < (start if start is not None else t + leg) + length:
+            to_lunch = lunch_legs[0][prev] if lunch_legs is not None and prev >= 0 else 0
+            leg_after = lunch_legs[1][k] if lunch_legs is not None else leg
+            lunch_start = max(lunch_at, t + to_lunch)
+            after = earliest_start(open_at, lunch_start + LUNCH_MIN + leg_after, length, day_end)
+            if after is None and start is not None:
+                # Only fits before lunch (it closes or the day ends): eat right after it
+                lunch_start = start + length + (lunch_legs[0][k] if lunch_legs is not None else 0)
+                if lunch_start + LUNCH_MIN <= day_end:
+                    slots[k] = (start, start + length)
+                    lunch = (k + 1, lunch_start, lunch_start + LUNCH_MIN)
+                    t = lunch_start + LUNCH_MIN
+                    prev = k
+                    at_lunch = lunch_legs is not None
+                    continue
+            lunch = (k, lunch_start, lunch_start + LUNCH_MIN)
+            t = lunch_start + LUNCH_MIN
+            at_lunch = lunch_legs is not None
+            start = after
+        if start is None:
+            continue
+        slots[k] = (start, start + length)
+        t = start + length
+        prev = k
+        at_lunch = False
+    return slots, lunch
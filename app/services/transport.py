@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import ssl
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+import httpx
+from ..core.config import settings
+
+T = TypeVar("T")
+
+# Query params that carry credentials; never written to fixtures or used in fixture keys
+SECRET_PARAMS = {"key", "appid"}
+# Headers describing the wire encoding of a body, dropped once it has been read and decoded
+DECODED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+def fixture_path(request: httpx.Request, fixtures_dir: str) -> str:
+    """Stable fixture file for a request, independent of API keys and param order"""
+    params = sorted((k, v) for k, v in request.url.params.multi_items() if k not in SECRET_PARAMS)
+    digest = hashlib.sha1(f"{request.method} {request.url.path} {params}".encode("utf-8")).hexdigest()[:16]
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", request.url.path).strip("_")
+    return os.path.join(fixtures_dir, request.url.host, f"{slug}-{digest}.json")
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Passes requests through to the real upstream and saves each response as a fixture"""
+
+    def __init__(self, fixtures_dir: str, inner: Optional[httpx.AsyncBaseTransport] = None):
+        self.fixtures_dir = fixtures_dir
+        self.inner = inner or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self.inner.handle_async_request(request)
+        body = await response.aread()
+        path = fixture_path(request, self.fixtures_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = body.decode("utf-8", errors="replace")
+        params = {k: v for k, v in request.url.params.multi_items() if k not in SECRET_PARAMS}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "request": {"method": request.method, "path": request.url.path, "params": params},
+                "status": response.status_code,
+                "body": payload,
+            }, f, ensure_ascii=False, indent=2)
+        # aread() decoded the body, so the upstream framing no longer describes it
+        headers = [(k, v) for k, v in response.headers.multi_items() if k.lower() not in DECODED_HEADERS]
+        return httpx.Response(response.status_code, headers=headers, content=body, request=request)
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+def replay_transport(fixtures_dir: str, latency_ms: float = 0.0, error_rate: float = 0.0,
+                     seed: Optional[int] = None) -> httpx.MockTransport:
+    """Serve recorded fixtures offline with optional injected latency and 503 errors.
+
+    Requests with no recorded fixture get a 404 so callers exercise their
+    empty-result paths instead of crashing."""
+    rng = random.Random(seed)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        if error_rate and rng.random() < error_rate:
+            return httpx.Response(503, json={"status": "UNAVAILABLE", "error": "injected failure"})
+        path = fixture_path(request, fixtures_dir)
+        if not os.path.exists(path):
+            return httpx.Response(404, json={"status": "NOT_FOUND", "error": "no fixture recorded"})
+        with open(path, "r", encoding="utf-8") as f:
+            fixture = json.load(f)
+        body = fixture["body"]
+        if isinstance(body, str):
+            return httpx.Response(fixture["status"], text=body)
+        return httpx.Response(fixture["status"], json=body)
+
+    return httpx.MockTransport(handler)
+
+@lru_cache(maxsize=1)
+def ssl_context() -> ssl.SSLContext:
+    """Loading the CA bundle takes tens of ms, so every client shares one context"""
+    return httpx.create_ssl_context()
+
+class SharedClient:
+    """One pooled AsyncClient per service, opened by the app lifespan.
+
+    An AsyncClient's connection pool belongs to the event loop that opened
+    it. Calls on that loop (async endpoints) reuse its keep-alive
+    connections. Calls from other loops, such as the planner's worker
+    threads, get a short-lived client as before."""
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def open(self):
+        if self._client is None:
+            verify = await asyncio.to_thread(ssl_context)
+            self._client = httpx.AsyncClient(transport=self.transport, verify=verify,
+                                             timeout=settings.external_timeout_s,
+                                             limits=httpx.Limits(max_keepalive_connections=20))
+            self._loop = asyncio.get_running_loop()
+
+    async def aclose(self):
+        client, self._client, self._loop = self._client, None, None
+        if client is not None:
+            await client.aclose()
+
+    @asynccontextmanager
+    async def get(self) -> AsyncIterator[httpx.AsyncClient]:
+        if self._client is not None and self._loop is asyncio.get_running_loop():
+            yield self._client
+        else:
+            async with httpx.AsyncClient(transport=self.transport, verify=ssl_context(),
+                                         timeout=settings.external_timeout_s) as client:
+                yield client
+
+async def hedged(call: Callable[[], Awaitable[T]], after_s: float) -> T:
+    """Result of call(), started a second time if the first has not answered within after_s.
+
+    Whichever attempt succeeds first wins and the other is cancelled; an
+    error only counts once both attempts failed. Only for idempotent reads.
+    after_s <= 0 disables the hedge."""
+    attempts = [asyncio.ensure_future(call())]
+    try:
+        if after_s > 0:
+            done, _ = await asyncio.wait(attempts, timeout=after_s)
+            if not done:
+                attempts.append(asyncio.ensure_future(call()))
+        pending = set(attempts)
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            failed = None
+            for attempt in done:
+                if attempt.exception() is None:
+                    return attempt.result()
+                failed = attempt
+            if not pending:
+                return failed.result()
+    finally:
+        for attempt in attempts:
+            attempt.cancel()
+
+def build_transport() -> Optional[httpx.AsyncBaseTransport]:
+    """Transport for outbound API calls according to EXTERNAL_API_MODE (live|record|replay)"""
+    mode = settings.external_api_mode
+    if mode == "record":
+        return RecordingTransport(settings.external_fixtures_dir)
+    if mode == "replay":
+        return replay_transport(
+            settings.external_fixtures_dir,
+            latency_ms=settings.replay_latency_ms,
+            error_rate=settings.replay_error_rate,
+            seed=settings.replay_seed,
+        )
+    return None
@@ -1,18 +1,44 @@
+import time
 import httpx
-from typing import Dict, Optional
-from datetime import datetime
+from typing import Dict, List, Optional, Set
+from datetime import date, datetime, timedelta, timezone
+from ..core.cache import TTLCache
 from ..core.config import settings
+from ..core.deadline import call_timeout
+from ..core.singleflight import flight
+from .transport import SharedClient, build_transport
+
+FORECAST_BUCKET_S = 3 * 3600  # OpenWeather forecast granularity
+RAIN_WORDS = ("rain", "drizzle", "thunderstorm", "shower", "snow", "sleet")
 
 class WeatherService:
-    def __init__(self):
-        self.api_key = settings.openweather_api_key
+    def __init__(self, api_key: Optional[str] = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.api_key = settings.openweather_api_key if api_key is None else api_key
         self.base_url = "https://api.openweathermap.org/data/2.5"
+        self.transport = transport
+        self.http = SharedClient(transport)
+        self.forecast_cache = TTLCache(ttl=settings.weather_forecast_ttl_s)
+        self.current_cache = TTLCache(ttl=settings.weather_current_ttl_s)
+
+    @property
+    def enabled(self) -> bool:
+        """Replayed fixtures need no key; live and record modes do"""
+        return bool(self.api_key) or settings.external_api_mode == "replay"
+
+    def _client(self):
+        return self.http.get()
     
     async def get_weather(self, city: str) -> Optional[Dict]:
         """Get current weather for a city"""
-        if not self.api_key:
+        if not self.enabled:
             return None
-        
+        key = city.strip().lower()
+        cached = self.current_cache.get(key)
+        if cached is not None:
+            return cached
+        return await flight("weather.current").do(key, lambda: self._get_weather(city, key))
+
+    async def _get_weather(self, city: str, key) -> Optional[Dict]:
         url = f"{self.base_url}/weather"
         params = {
             "q": city,
@@ -20,13 +46,13 @@ class WeatherService:
             "units": "metric"
         }
         
-        async with httpx.AsyncClient() as client:
+        async with self._client() as client:
             try:
-                response = await client.get(url, params=params)
+                response = await client.get(url, params=params, timeout=call_timeout(settings.external_timeout_s))
                 data = response.json()
                 
                 if response.status_code == 200:
-                    return {
+                    current = {
                         "city": city,
                         "temperature": data["main"]["temp"],
                         "description": data["weather"][0]["description"],
@@ -34,16 +60,28 @@ class WeatherService:
                         "wind_speed": data["wind"]["speed"],
                         "icon": data["weather"][0]["icon"]
                     }
+                    self.current_cache.set(key, current)
+                    return current
                 return None
             except Exception as e:
                 print(f"Error fetching weather: {e}")
                 return None
     
     async def get_forecast(self, city: str, days: int = 5) -> Optional[Dict]:
-        """Get weather forecast for a city"""
-        if not self.api_key:
+        """Get weather forecast for a city.
+
+        Cached per city and 3-hour bucket: a new upstream forecast is only
+        published once per bucket, so repeated plans for a city reuse it.
+        Concurrent misses for the same key share one upstream call."""
+        if not self.enabled:
             return None
-        
+        key = (city.strip().lower(), days, int(time.time() // FORECAST_BUCKET_S))
+        cached = self.forecast_cache.get(key)
+        if cached is not None:
+            return cached
+        return await flight("weather.forecast").do(key, lambda: self._get_forecast(city, days, key))
+
+    async def _get_forecast(self, city: str, days: int, key) -> Optional[Dict]:
         url = f"{self.base_url}/forecast"
         params = {
             "q": city,
@@ -52,16 +90,18 @@ class WeatherService:
             "cnt": days * 8  # 8 forecasts per day (3-hour intervals)
         }
         
-        async with httpx.AsyncClient() as client:
+        async with self._client() as client:
             try:
-                response = await client.get(url, params=params)
+                response = await client.get(url, params=params, timeout=call_timeout(settings.external_timeout_s))
                 data = response.json()
                 
                 if response.status_code == 200:
+                    # Slots in the destination's local time, so day keys are its calendar days
+                    tz = timezone(timedelta(seconds=int((data.get("city") or {}).get("timezone", 0))))
                     forecasts = []
                     for item in data["list"]:
                         forecasts.append({
-                            "datetime": datetime.fromtimestamp(item["dt"]),
+                            "datetime": datetime.fromtimestamp(item["dt"], tz),
                             "temperature": item["main"]["temp"],
                             "description": item["weather"][0]["description"],
                             "humidity": item["main"]["humidity"],
@@ -69,13 +109,51 @@ class WeatherService:
                             "icon": item["weather"][0]["icon"]
                         })
                     
-                    return {
+                    forecast = {
                         "city": city,
                         "forecasts": forecasts
                     }
+                    self.forecast_cache.set(key, forecast)
+                    return forecast
                 return None
             except Exception as e:
                 print(f"Error fetching forecast: {e}")
                 return None
 
-weather_service = WeatherService()
+def is_rainy(description: str) -> bool:
+    desc = (description or "").lower()
+    return any(w in desc for w in RAIN_WORDS)
+
+def rainy_days(forecast: Optional[Dict], day_start: int = 9, day_end: int = 19) -> Set[date]:
+    """Dates where most daytime forecast slots predict precipitation"""
+    if not forecast:
+        return set()
+    slots: Dict[date, List[bool]] = {}
+    for f in forecast.get("forecasts", []):
+        dt = f["datetime"]
+        if day_start <= dt.hour < day_end:
+            slots.setdefault(dt.date(), []).append(is_rainy(f["description"]))
+    return {d for d, wet in slots.items() if sum(wet) * 2 >= len(wet)}
+
+def daily_summary(forecast: Optional[Dict]) -> List[Dict]:
+    """Collapse 3-hour forecast slots into per-day high/low and dominant condition"""
+    if not forecast:
+        return []
+    by_day: Dict[date, List[Dict]] = {}
+    for f in forecast.get("forecasts", []):
+        by_day.setdefault(f["datetime"].date(), []).append(f)
+    out = []
+    for d in sorted(by_day):
+        slots = by_day[d]
+        descs = [s["description"] for s in slots]
+        out.append({
+            "date": d,
+            "high": max(s["temperature"] for s in slots),
+            "low": min(s["temperature"] for s in slots),
+            "condition": max(set(descs), key=descs.count),
+            "icon": slots[len(slots) // 2]["icon"],
+            "rainy": d in rainy_days({"forecasts": slots}),
+        })
+    return out
+
+weather_service = WeatherService(transport=build_transport())
@@ -0,0 +1,172 @@
+"""
+Backend API client for the Streamlit frontend
+
+- One pooled requests.Session per server process (keep-alive, GET retries)
+- Read endpoints cached with st.cache_data; mutations invalidate what they touch
+- Explicit connect/read timeouts on every call
+- fetch_concurrently() for pages that need several resources at once
+- Plan generation runs as a backend job that the form polls
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:  # older Streamlit
+    add_script_run_ctx = get_script_run_ctx = None
+
+# Reads from environment if provided (e.g., on Railway for frontend service),
+# falls back to localhost for local development
+API_BASE = os.getenv("API_BASE", os.getenv("BACKEND_URL", "http://localhost:8000"))
+
+TIMEOUT = (3.05, 20)        # (connect, read) seconds
+PLAN_TIMEOUT = (3.05, 120)  # plan generation may call Google Places
+
+TRIPS_TTL = 30
+CATALOG_TTL = 300
+WEATHER_TTL = 600
+
+
+@st.cache_resource
+def _session() -> requests.Session:
+    session = requests.Session()
+    retry = Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504], allowed_methods=["GET"])
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _get(path, params=None):
+    response = _session().get(f"{API_BASE}{path}", params=dict(params or ()), timeout=TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+# Cached fetchers raise on failure so errors are never cached; callers below
+# turn them into empty defaults. Params are passed as tuples to stay hashable.
+@st.cache_data(ttl=TRIPS_TTL, show_spinner=False)
+def _trips_json(path, params=()):
+    return _get(path, params)
+
+
+@st.cache_data(ttl=CATALOG_TTL, show_spinner=False)
+def _catalog_json(path, params=()):
+    return _get(path, params)
+
+
+@st.cache_data(ttl=WEATHER_TTL, show_spinner=False)
+def _weather_json(path):
+    return _get(path)
+
+
+def _safe(fetch, default, *args):
+    try:
+        return fetch(*args)
+    except requests.exceptions.ConnectionError:
+        st.session_state["backend_offline"] = True
+        return default
+    except Exception:
+        return default
+
+
+def invalidate_trips():
+    _trips_json.clear()
+
+
+def invalidate_catalog():
+    _catalog_json.clear()
+
+
+def get_trips():
+    """Fetch all trips, each with its item count, cost total and day span"""
+    return _safe(_trips_json, [], "/trips", (("include", "summary"),))
+
+
+def get_stats():
+    """Fetch trip/place/city counts without downloading the catalog"""
+    return _safe(_trips_json, {}, "/stats")
+
+
+def get_trip_plan(trip_id):
+    """Fetch the day-by-day plan of a saved trip"""
+    return _safe(_trips_json, None, f"/trips/{trip_id}/plan")
+
+
+def get_places(city=None, category=None):
+    """Fetch places from API"""
+    params = tuple((k, v) for k, v in (("city", city), ("category", category)) if v)
+    return _safe(_catalog_json, [], "/places", params)
+
+
+def get_clusters(zoom, bbox=None, category=None):
+    """Fetch server-side map clusters for a viewport"""
+    params = tuple((k, v) for k, v in (("zoom", zoom), ("bbox", bbox), ("category", category)) if v is not None)
+    return _safe(_catalog_json, {}, "/places/clusters", params)
+
+
+def get_recommendations(city):
+    """Get recommendations for a city"""
+    return _safe(_catalog_json, [], f"/Recommendations/{city}")
+
+
+def get_weather(city):
+    """Get current weather and daily forecast for a city"""
+    return _safe(_weather_json, None, f"/weather/{city}")
+
+
+def _plan_invalidate(plan_data):
+    """Saved trips and Google-fetched places make cached lists stale"""
+    if not plan_data.get("dry_run", True):
+        invalidate_trips()
+    if plan_data.get("use_google") or plan_data.get("country_mode"):
+        invalidate_catalog()
+
+
+def create_trip_plan(plan_data):
+    """Generate a plan synchronously (holds the request open for the whole run)"""
+    response = _session().post(f"{API_BASE}/plan/generate", json=plan_data, timeout=PLAN_TIMEOUT)
+    if response.status_code != 200:
+        raise RuntimeError(f"API Error: {response.status_code} - {response.text}")
+    _plan_invalidate(plan_data)
+    return response.json()
+
+
+def submit_plan_job(plan_data):
+    """Queue a plan on the backend; returns the job status with its job_id"""
+    response = _session().post(f"{API_BASE}/plan/jobs", json=plan_data, timeout=TIMEOUT)
+    if response.status_code != 202:
+        raise RuntimeError(f"API Error: {response.status_code} - {response.text}")
+    return response.json()
+
+
+def get_plan_job(job_id, plan_data=None):
+    """Poll a plan job; invalidates caches once it has finished"""
+    job = _get(f"/plan/jobs/{job_id}")
+    if job.get("status") == "done" and plan_data is not None:
+        _plan_invalidate(plan_data)
+    return job
+
+
+def fetch_concurrently(**calls):
+    """Run several zero-arg fetchers in parallel: fetch_concurrently(trips=get_trips, ...)"""
+    ctx = get_script_run_ctx() if get_script_run_ctx else None
+
+    def run(fn):
+        if ctx is not None:
+            add_script_run_ctx(ctx=ctx)
+        return fn()
+
+    with ThreadPoolExecutor(max_workers=len(calls) or 1) as pool:
+        futures = {name: pool.submit(run, fn) for name, fn in calls.items()}
+        return {name: f.result() for name, f in futures.items()}
+
+
+def backend_offline():
+    """True (once) if a fetch during this run could not reach the backend"""
+    return st.session_state.pop("backend_offline", False)
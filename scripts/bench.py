@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+Self-contained benchmark suite for Travel Planner API
+
+- Generates a synthetic catalog (cities x places) into a temp SQLite DB
+- Micro-benchmarks the planner hot paths and place search
+- Compares ORM place lists with the columnar place store (memory per 10k, pick latency)
+- Runs an in-process ASGI load test against the main endpoints
+- Optionally measures cold start: import time, time to first byte and first plan
+- Writes results to JSON so runs can be compared across commits
+
+Usage:
+  python scripts/bench.py
+  python scripts/bench.py --cities 1000 --places 500 --out bench.json
+
+Cold start (spawns the API N times against the synthetic catalog):
+  python scripts/bench.py --startup 5 --skip-load
+
+Plan latency SLO against a slow upstream (Places and weather answer after 30s;
+exits non-zero if POST /plan/generate p99 is above the target):
+  python scripts/bench.py --upstream-delay-ms 30000 --requests 50 --slo-p99-ms 5000
+
+Compare two runs:
+  python scripts/bench.py --compare old.json new.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+CATEGORIES = ["sights", "museum", "food", "nature", "shopping", "nightlife", "activity"]
+# Food dominates real catalogs; nightlife and generic activities are rarer
+CATEGORY_WEIGHTS = [18, 12, 35, 10, 12, 6, 7]
+# Cycled through by place number so adding hours leaves the random catalog unchanged
+HOURS = [None, "1000-1800", "|1000-1800|1000-1800|1000-1800|1000-2100|1000-1800|1000-1800", "0900-1200,1400-1900"]
+NAME_PARTS = ["Old", "Grand", "Royal", "City", "River", "Hill", "Garden", "Market", "Harbor", "Park",
+              "Gallery", "Tower", "Square", "Bridge", "Palace", "Cafe", "Bistro", "Hall", "Temple", "Street"]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(samples_ms):
+    return {
+        "n": len(samples_ms),
+        "mean_ms": round(statistics.fmean(samples_ms), 4) if samples_ms else 0.0,
+        "p50_ms": round(percentile(samples_ms, 50), 4),
+        "p95_ms": round(percentile(samples_ms, 95), 4),
+        "p99_ms": round(percentile(samples_ms, 99), 4),
+        "max_ms": round(max(samples_ms), 4) if samples_ms else 0.0,
+    }
+
+
+def generate_catalog(n_cities, n_places, seed=42):
+    """Yield synthetic place rows clustered around random city centers.
+
+    Places are spread with a gaussian of ~4 km around the center so the
+    planner's routing sees realistic intra-city distances."""
+    rng = random.Random(seed)
+    for ci in range(n_cities):
+        city = f"City{ci:04d}"
+        c_lat = rng.uniform(-55.0, 65.0)
+        c_lng = rng.uniform(-170.0, 170.0)
+        for pi in range(n_places):
+            category = rng.choices(CATEGORIES, CATEGORY_WEIGHTS)[0]
+            yield {
+                "city": city,
+                "name": f"{rng.choice(NAME_PARTS)} {rng.choice(NAME_PARTS)} {pi}",
+                "category": category,
+                "lat": c_lat + rng.gauss(0, 0.035),
+                "lng": c_lng + rng.gauss(0, 0.05),
+                "rating": round(min(5.0, max(1.0, rng.gauss(4.2, 0.4))), 1),
+                "price_level": rng.choices([0, 1, 2, 3, 4], [5, 25, 40, 20, 10])[0],
+                "description": f"Synthetic {category} spot number {pi} in {city}.",
+                "hours": HOURS[pi % len(HOURS)],
+            }
+
+
+def load_catalog(engine, n_cities, n_places, batch=5000):
+    from sqlalchemy import insert
+    from app.models import Place
+    rows = []
+    with engine.begin() as conn:
+        for row in generate_catalog(n_cities, n_places):
+            rows.append(row)
+            if len(rows) >= batch:
+                conn.execute(insert(Place), rows)
+                rows = []
+        if rows:
+            conn.execute(insert(Place), rows)
+
+
+def timeit(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return summarize(samples)
+
+
+def run_micro(engine, cities, repeat):
+    from sqlmodel import Session
+    from app.services import planner
+    from app.api.places import search_places
+
+    results = {}
+    rng = random.Random(7)
+    interests = ["sights", "museum", "food"]
+    with Session(engine) as session:
+        results["_pick_places"] = timeit(
+            lambda: planner._pick_places(session, rng.choice(cities), interests, 30, 3), repeat)
+
+        pool = planner._pick_places(session, cities[0], [], 200, None)
+        for size in (8, 50, 200):
+            pts = pool[:size]
+            results[f"_nearest_neighbor_order[{len(pts)}]"] = timeit(
+                lambda: planner._nearest_neighbor_order(pts), repeat)
+
+        # Batch path: slot 1000 days of one week's routes with hours and travel legs
+        days = [date(2026, 1, 5) + timedelta(days=k % 7) for k in range(1000)]
+        routes = [planner._nearest_neighbor_order(pool[k:k + 6]) for k in range(0, 42, 6)]
+        lengths = [[planner._duration_for(p.category, "standard") for p in r] for r in routes]
+        dist = planner.point_km
+        params = planner.PlanParams(destination=cities[0], start_date=days[0], end_date=days[0], interests=[])
+        results["_timeline[1000 days]"] = timeit(
+            lambda: [planner._timeline(routes[k % 7], lengths[k % 7], d, params, dist) for k, d in enumerate(days)],
+            max(repeat // 10, 3))
+
+        def plan():
+            params = planner.PlanParams(
+                destination=rng.choice(cities),
+                start_date=date(2026, 1, 1),
+                end_date=date(2026, 1, 7),
+                interests=list(interests),
+            )
+            planner.generate_plan(session, params)
+        results["generate_plan[7d]"] = timeit(plan, repeat)
+
+        def plans():
+            params = planner.PlanParams(
+                destination=rng.choice(cities),
+                start_date=date(2026, 1, 1),
+                end_date=date(2026, 1, 7),
+                interests=list(interests),
+            )
+            planner.generate_plans(session, params, 3)
+        results["generate_plans[7d x3]"] = timeit(plans, repeat)
+
+        results["search_places"] = timeit(
+            lambda: search_places(q="museum", city=rng.choice(cities), session=session), repeat)
+    return results
+
+
+def run_place_store(engine, cities, repeat, n=10000):
+    """ORM Place lists vs the columnar CityPlaces store: heap per 10k places and pick latency"""
+    import tracemalloc
+    from sqlmodel import Session, select
+    from app.models import Place
+    from app.services.place_store import COLUMNS, CityPlaces
+
+    def orm_pick(places, interests, count, budget_level):
+        # The planner's pre-columnar path: filter and sort ORM instances in Python
+        picked = [p for p in places if p.category in interests and p.price_level <= budget_level]
+        picked.sort(key=lambda p: (-p.rating, p.price_level, p.name))
+        return picked[:count]
+
+    results = {}
+    with Session(engine) as session:
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        orm = session.exec(select(Place).limit(n)).all()
+        orm_bytes = sum(s.size_diff for s in tracemalloc.take_snapshot().compare_to(before, "filename"))
+        session.expunge_all()
+        before = tracemalloc.take_snapshot()
+        store = CityPlaces(session.exec(select(*COLUMNS).limit(n)).all())
+        store_bytes = sum(s.size_diff for s in tracemalloc.take_snapshot().compare_to(before, "filename"))
+        tracemalloc.stop()
+        scale = 10000 / max(len(orm), 1)
+        results["memory_per_10k"] = {
+            "places": len(orm),
+            "orm_mb": round(orm_bytes * scale / 1e6, 2),
+            "columnar_mb": round(store_bytes * scale / 1e6, 2),
+        }
+
+        interests = ["sights", "museum", "food"]
+        city_orm = [p for p in orm if p.city == cities[0]]
+        city_store = CityPlaces(session.exec(select(*COLUMNS).where(Place.city == cities[0])).all())
+        results["pick[orm]"] = timeit(lambda: orm_pick(city_orm, interests, 30, 3), repeat)
+        results["pick[columnar]"] = timeit(lambda: city_store.pick(interests, 30, 3), repeat)
+    return results
+
+
+def slow_upstream(delay_ms):
+    """Serve Places and weather calls from an upstream that answers after delay_ms, with no results"""
+    import httpx
+    from app.services.google_places import google_places_service
+    from app.services.transport import SharedClient
+    from app.services.weather import weather_service
+
+    async def handler(request):
+        await asyncio.sleep(delay_ms / 1000)
+        return httpx.Response(200, json={"status": "ZERO_RESULTS", "results": [], "list": []})
+
+    for service in (google_places_service, weather_service):
+        service.api_key = "bench"
+        service.http = SharedClient(httpx.MockTransport(handler))
+
+
+async def run_load(app, cities, requests_per_endpoint, concurrency, use_google=False):
+    import httpx
+
+    today = date(2026, 1, 1)
+    rng = random.Random(11)
+    endpoints = {
+        "GET /health": lambda c: c.get("/health"),
+        "GET /trips": lambda c: c.get("/trips"),
+        "GET /places?city": lambda c: c.get("/places", params={"city": rng.choice(cities)}),
+        "GET /places/search": lambda c: c.get("/places/search", params={"q": "park", "city": rng.choice(cities)}),
+        "GET /Recommendations/{city}": lambda c: c.get(f"/Recommendations/{rng.choice(cities)}"),
+        "POST /plan/generate": lambda c: c.post("/plan/generate", json={
+            "destination": rng.choice(cities),
+            "start_date": today.isoformat(),
+            "end_date": (today + timedelta(days=2)).isoformat(),
+            "dry_run": True,
+            "use_google": use_google,
+        }),
+    }
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, call in endpoints.items():
+            sem = asyncio.Semaphore(concurrency)
+            samples, errors = [], 0
+
+            async def one():
+                nonlocal errors
+                async with sem:
+                    t0 = time.perf_counter()
+                    r = await call(client)
+                    samples.append((time.perf_counter() - t0) * 1000)
+                    if r.status_code >= 400:
+                        errors += 1
+
+            t0 = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(requests_per_endpoint)))
+            wall = time.perf_counter() - t0
+            stats = summarize(samples)
+            stats["req_per_s"] = round(len(samples) / wall, 2) if wall else 0.0
+            stats["errors"] = errors
+            results[name] = stats
+    return results
+
+
+IMPORT_PROBE = "import time; t = time.perf_counter(); import app.main; print((time.perf_counter() - t) * 1000)"
+
+
+def free_port():
+    import socket
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_startup(db_url, city, runs, timeout_s=60):
+    """Cold-start timings from fresh processes: app import, first /health byte,
+    catalog warm-up finished, then the first plan"""
+    import httpx
+
+    env = dict(os.environ, DATABASE_URL=db_url)
+    imports, ttfb, warm, first_plan = [], [], [], []
+    for _ in range(runs):
+        out = subprocess.check_output([sys.executable, "-c", IMPORT_PROBE], cwd=ROOT, env=env, text=True)
+        imports.append(float(out.strip().splitlines()[-1]))
+
+        port = free_port()
+        t0 = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=ROOT, env=env,
+        )
+        try:
+            with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=timeout_s) as client:
+                while True:
+                    try:
+                        if client.get("/health").status_code == 200:
+                            break
+                    except httpx.TransportError:
+                        pass
+                    if time.perf_counter() - t0 > timeout_s:
+                        raise RuntimeError("API did not start")
+                    time.sleep(0.005)
+                ttfb.append((time.perf_counter() - t0) * 1000)
+                while client.get("/health").json().get("warmup") == "running":
+                    if time.perf_counter() - t0 > timeout_s:
+                        raise RuntimeError("warm-up did not finish")
+                    time.sleep(0.005)
+                warm.append((time.perf_counter() - t0) * 1000)
+                t1 = time.perf_counter()
+                client.post("/plan/generate", json={
+                    "destination": city, "start_date": "2026-01-01", "end_date": "2026-01-03", "dry_run": True,
+                }).raise_for_status()
+                first_plan.append((time.perf_counter() - t1) * 1000)
+        finally:
+            proc.terminate()
+            proc.wait()
+    return {"import": summarize(imports), "ttfb": summarize(ttfb), "warm": summarize(warm),
+            "first_plan": summarize(first_plan)}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+def compare(old_path, new_path):
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"{old.get('revision')} -> {new.get('revision')}")
+    for section in ("micro", "load", "startup"):
+        print(f"\n[{section}] p50 / p95 ms")
+        for name, stats in new.get(section, {}).items():
+            before = old.get(section, {}).get(name)
+            if not before:
+                print(f"  {name:40s} {stats['p50_ms']:>10.3f} {stats['p95_ms']:>10.3f}  (new)")
+                continue
+            delta = (stats["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100 if before["p50_ms"] else 0.0
+            print(f"  {name:40s} {stats['p50_ms']:>10.3f} {stats['p95_ms']:>10.3f}  {delta:+6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", type=int, default=50)
+    parser.add_argument("--places", type=int, default=200, help="places per city")
+    parser.add_argument("--repeat", type=int, default=50, help="iterations per micro-benchmark")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint in the load test")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--out", default="bench_output.json")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--startup", type=int, default=0, metavar="N", help="cold-start the API N times")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    parser.add_argument("--upstream-delay-ms", type=float, default=0,
+                        help="plans fetch from Google via an upstream this slow (load test)")
+    parser.add_argument("--slo-p99-ms", type=float, default=0, help="fail if POST /plan/generate p99 exceeds this")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    tmpdir = tempfile.mkdtemp(prefix="travel-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+
+    # Import after DATABASE_URL is set so the app binds to the temp DB
+    from app.db import engine, create_db_and_tables
+    from app.main import app
+
+    create_db_and_tables()
+    t0 = time.perf_counter()
+    load_catalog(engine, args.cities, args.places)
+    load_s = time.perf_counter() - t0
+    cities = [f"City{ci:04d}" for ci in range(args.cities)]
+    print(f"Catalog: {args.cities} cities x {args.places} places loaded in {load_s:.1f}s ({tmpdir})")
+
+    report = {
+        "revision": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "catalog": {"cities": args.cities, "places_per_city": args.places, "load_s": round(load_s, 3)},
+        "micro": run_micro(engine, cities, args.repeat) | run_place_store(engine, cities, args.repeat),
+    }
+    if not args.skip_load:
+        if args.upstream_delay_ms:
+            slow_upstream(args.upstream_delay_ms)
+            report["upstream_delay_ms"] = args.upstream_delay_ms
+        report["load"] = asyncio.run(run_load(app, cities, args.requests, args.concurrency,
+                                              use_google=bool(args.upstream_delay_ms)))
+    if args.startup:
+        from sqlmodel import Session
+        from app.services.place_store import hot_cities
+        with Session(engine) as session:
+            hottest = hot_cities(session, 1)[0]
+        report["startup"] = run_startup(os.environ["DATABASE_URL"], hottest, args.startup)
+
+    mem = report["micro"].pop("memory_per_10k")
+    report["memory_per_10k"] = mem
+    print(f"  {'memory per 10k places':40s} orm={mem['orm_mb']}MB columnar={mem['columnar_mb']}MB")
+    for section in ("micro", "load", "startup"):
+        for name, stats in report.get(section, {}).items():
+            extra = f"  {stats['req_per_s']:.1f} req/s" if "req_per_s" in stats else ""
+            print(f"  {name:40s} p50={stats['p50_ms']:.3f}ms p95={stats['p95_ms']:.3f}ms p99={stats['p99_ms']:.3f}ms{extra}")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.out}")
+    plan = report.get("load", {}).get("POST /plan/generate")
+    if args.slo_p99_ms and plan:
+        ok = plan["p99_ms"] <= args.slo_p99_ms
+        print(f"SLO POST /plan/generate p99 {plan['p99_ms']:.0f}ms <= {args.slo_p99_ms:.0f}ms: {'ok' if ok else 'FAILED'}")
+        if not ok:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Database maintenance: purge orphaned rows, then refresh statistics and compact
+
+- Deletes itinerary items whose trip no longer exists (left behind by trip
+  deletes from before items were removed with their trip)
+- Runs ANALYZE so the query planner has current statistics
+- Runs VACUUM to return freed pages to the OS (SQLite rewrites the whole
+  file and needs free disk space of about its size; skip with --no-vacuum)
+
+Usage:
+  python scripts/maintenance.py
+  python scripts/maintenance.py --dry-run
+  python scripts/maintenance.py --no-vacuum
+
+Environment:
+  DATABASE_URL   # same database the API uses
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import delete, func, select, text
+from app.db import engine
+from app.models import ItineraryItem, Trip
+
+
+def orphan_items():
+    return ~select(Trip.id).where(Trip.id == ItineraryItem.trip_id).exists()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="only count orphans")
+    parser.add_argument("--no-vacuum", action="store_true", help="skip VACUUM (ANALYZE still runs)")
+    args = parser.parse_args()
+
+    with engine.begin() as conn:
+        if args.dry_run:
+            count = conn.execute(select(func.count()).select_from(ItineraryItem).where(orphan_items())).scalar_one()
+            print(f"{count} orphaned itinerary items")
+            return
+        count = conn.execute(delete(ItineraryItem).where(orphan_items())).rowcount
+    print(f"Purged {count} orphaned itinerary items")
+
+    # VACUUM cannot run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for statement in ("ANALYZE",) + (() if args.no_vacuum else ("VACUUM",)):
+            t0 = time.perf_counter()
+            conn.execute(text(statement))
+            print(f"{statement}: {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Generate synthetic Google Places / OpenWeather fixtures for replay mode
+
+Drives the real services through the recording transport on top of a fake
+upstream, so the fixture files match exactly what the services request.
+Use this when no API keys are available; to capture real responses run the
+backend with EXTERNAL_API_MODE=record instead.
+
+Usage:
+  python scripts/make_fixtures.py Paris Tokyo Japan
+  EXTERNAL_API_MODE=replay REPLAY_LATENCY_MS=150 uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from app.core.config import settings
+from app.services.google_places import GooglePlacesService
+from app.services.transport import RecordingTransport
+from app.services.weather import WeatherService
+
+CATEGORIES = ["sights", "museum", "food", "nature", "shopping", "nightlife"]
+GOOGLE_TYPES = {
+    "tourist_attraction": "Landmark", "museum": "Museum", "restaurant": "Kitchen",
+    "park": "Gardens", "shopping_mall": "Arcade", "night_club": "Club",
+}
+PAGES = 3  # nearby search result pages per query, as Google serves
+CONDITIONS = [("clear sky", "01d"), ("few clouds", "02d"), ("light rain", "10d"), ("overcast clouds", "04d")]
+
+
+def fake_upstream(seed: int) -> httpx.MockTransport:
+    def handler(request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        path = request.url.path
+        # Seed per request so the same query always yields the same payload
+        rng = random.Random(f"{seed}:{path}:{sorted(params.multi_items())}")
+        if path.endswith("/geocode/json"):
+            crng = random.Random(f"{seed}:{params['address'].lower()}")
+            return httpx.Response(200, json={"status": "OK", "results": [{
+                "geometry": {"location": {"lat": crng.uniform(-50, 60), "lng": crng.uniform(-170, 170)}}
+            }]})
+        if path.endswith("/nearbysearch/json"):
+            if "pagetoken" in params:
+                # Our tokens carry the original query, like Google's opaque ones
+                page, location, gtype, radius = params["pagetoken"].split("|")
+                page = int(page)
+            else:
+                page, location = 0, params["location"]
+                gtype, radius = params.get("type", "tourist_attraction"), params.get("radius", "50000")
+            lat, lng = (float(x) for x in location.split(","))
+            spread = int(radius) / 111_000 / 3
+            results = [{
+                "name": f"{rng.choice(['Old', 'Grand', 'Royal', 'River', 'Hill'])} {GOOGLE_TYPES.get(gtype, 'Spot')} {i}",
+                "types": [gtype, "point_of_interest"],
+                "geometry": {"location": {"lat": lat + rng.gauss(0, spread), "lng": lng + rng.gauss(0, spread)}},
+                "rating": round(rng.uniform(3.5, 5.0), 1),
+                "price_level": rng.randint(0, 4),
+                "vicinity": f"{rng.randint(1, 200)} Synthetic Street",
+            } for i in range(page * 20, page * 20 + 20)]
+            body = {"status": "OK", "results": results}
+            if page + 1 < PAGES:
+                body["next_page_token"] = f"{page + 1}|{location}|{gtype}|{radius}"
+            return httpx.Response(200, json=body)
+        if path.endswith("/weather"):
+            desc, icon = rng.choice(CONDITIONS)
+            return httpx.Response(200, json={
+                "main": {"temp": round(rng.uniform(5, 30), 1), "humidity": rng.randint(30, 90)},
+                "weather": [{"description": desc, "icon": icon}],
+                "wind": {"speed": round(rng.uniform(0, 12), 1)},
+            })
+        if path.endswith("/forecast"):
+            now = int(time.time()) // 10800 * 10800
+            items = []
+            for i in range(int(params.get("cnt", "40"))):
+                desc, icon = rng.choice(CONDITIONS)
+                items.append({
+                    "dt": now + i * 10800,
+                    "main": {"temp": round(rng.uniform(5, 30), 1), "humidity": rng.randint(30, 90)},
+                    "weather": [{"description": desc, "icon": icon}],
+                    "wind": {"speed": round(rng.uniform(0, 12), 1)},
+                })
+            # OpenWeather gives the city's UTC offset in seconds
+            return httpx.Response(200, json={"list": items, "city": {"name": params["q"], "timezone": 3600}})
+        return httpx.Response(404, json={"status": "NOT_FOUND"})
+
+    return httpx.MockTransport(handler)
+
+
+async def record(cities, out_dir, seed):
+    # The fake upstream's page tokens are usable at once
+    settings.google_page_token_delay_s = 0
+    transport = RecordingTransport(out_dir, inner=fake_upstream(seed))
+    places = GooglePlacesService(api_key="synthetic", transport=transport)
+    weather = WeatherService(api_key="synthetic", transport=transport)
+    for city in cities:
+        for radius in (50000, 150000):
+            for cat in CATEGORIES:
+                await places.search_places(city, cat, radius=radius)
+        await weather.get_weather(city)
+        await weather.get_forecast(city)
+        print(f"Recorded fixtures for {city}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cities", nargs="+")
+    parser.add_argument("--out", default=settings.external_fixtures_dir)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(record(args.cities, args.out, args.seed))
+    print(f"Fixtures written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
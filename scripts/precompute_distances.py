@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Precompute per-city place distance matrices for the planner
+
+Writes <city>.ids.npy (place ids), <city>.dist.npy (float32 km matrix) and
+<city>.json (catalog fingerprint) per city. The API memory-maps them, so all
+workers share one copy through the OS page cache. A file whose fingerprint no
+longer matches the city's places is ignored until this is re-run.
+
+Usage:
+  python scripts/precompute_distances.py Paris Tokyo
+  python scripts/precompute_distances.py --top 50
+  python scripts/precompute_distances.py --top 50 --out /srv/distances
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.db import engine
+from app.services.distances import write_city
+from app.services.place_store import hot_cities
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("cities", nargs="*")
+    parser.add_argument("--top", type=int, default=0, help="also include the N cities with the most places")
+    parser.add_argument("--out", default=settings.distance_matrix_dir)
+    args = parser.parse_args()
+    with Session(engine) as session:
+        cities = list(args.cities)
+        if args.top:
+            cities += [c for c in hot_cities(session, args.top) if c not in {x.lower() for x in cities}]
+        if not cities:
+            parser.error("give city names or --top N")
+        for city in cities:
+            t0 = time.perf_counter()
+            meta = write_city(session, city, args.out)
+            mb = meta["count"] ** 2 * 4 / 1e6
+            print(f"{city}: {meta['count']} places, {mb:.1f} MB, {time.perf_counter() - t0:.2f}s")
+    print(f"Distance matrices written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,16 @@ import streamlit as st
 import requests
 import pandas as pd
 import folium
+from folium.plugins import FastMarkerCluster
 from streamlit_folium import st_folium
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, date, time
-import asyncio
-import httpx
+import math
 import os
+import time as clock
+import frontend_api as api
+from frontend_api import get_trips, get_trip_plan, get_places, get_weather
 
 # Page config
 st.set_page_config(
@@ -18,71 +21,105 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# API Base URL
-# Reads from environment if provided (e.g., on Railway for frontend service),
-# falls back to localhost for local development
-API_BASE = os.getenv("API_BASE", os.getenv("BACKEND_URL", "http://localhost:8000"))
-
 # Initialize session state
 if 'trips' not in st.session_state:
     st.session_state.trips = []
 if 'current_trip' not in st.session_state:
     st.session_state.current_trip = None
 
+JOB_POLL_S = 1.0
+JOB_MAX_WAIT_S = 300
+
 # Helper functions
-def get_trips():
-    """Fetch all trips from API"""
-    try:
-        response = requests.get(f"{API_BASE}/trips")
-        if response.status_code == 200:
-            return response.json()
-        return []
-    except requests.exceptions.ConnectionError:
-        st.warning("⚠️ Backend not connected. Some features may not work.")
-        return []
-    except:
-        return []
+def run_plan_job(plan_data):
+    """Queue the plan on the backend and poll it, showing progress"""
+    job = api.submit_plan_job(plan_data)
+    bar = st.progress(0, text="Queued...")
+    deadline = clock.monotonic() + JOB_MAX_WAIT_S
+    while job.get("status") in ("queued", "running"):
+        if clock.monotonic() > deadline:
+            bar.empty()
+            raise requests.exceptions.Timeout(f"plan job {job['job_id']} still {job['status']}")
+        clock.sleep(JOB_POLL_S)
+        job = api.get_plan_job(job["job_id"], plan_data)
+        bar.progress(job.get("progress", 0), text=f"{job.get('stage', '').capitalize()}...")
+    bar.empty()
+    if job.get("status") != "done":
+        raise RuntimeError(job.get("error") or "plan job failed")
+    return job["result"]
 
 def create_trip_plan(plan_data):
     """Create a new trip plan"""
     try:
-        response = requests.post(f"{API_BASE}/plan/generate", json=plan_data)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.error(f"API Error: {response.status_code} - {response.text}")
-            return None
+        return run_plan_job(plan_data)
     except requests.exceptions.ConnectionError:
-        st.error("❌ Cannot connect to FastAPI backend. Make sure it's running on http://localhost:8000")
+        st.error(f"❌ Cannot connect to FastAPI backend. Make sure it's running on {api.API_BASE}")
+        return None
+    except requests.exceptions.Timeout:
+        st.error("❌ The planner is taking longer than expected. Your trip will appear under My Trips once it finishes.")
         return None
     except Exception as e:
         st.error(f"❌ Error: {str(e)}")
         return None
 
-def get_places(city=None, category=None):
-    """Fetch places from API"""
-    try:
-        params = {}
-        if city:
-            params['city'] = city
-        if category:
-            params['category'] = category
-        response = requests.get(f"{API_BASE}/places", params=params)
-        if response.status_code == 200:
-            return response.json()
-        return []
-    except:
-        return []
+# Above this many points, markers are clustered client-side from compact arrays
+MARKER_LIMIT = 150
 
-def get_recommendations(city):
-    """Get recommendations for a city"""
-    try:
-        response = requests.get(f"{API_BASE}/Recommendations/{city}")
-        if response.status_code == 200:
-            return response.json()
-        return []
-    except:
-        return []
+CATEGORY_COLORS = {
+    'sights': 'red',
+    'museum': 'blue',
+    'food': 'green',
+    'nature': 'orange',
+    'shopping': 'purple',
+    'nightlife': 'darkred',
+    'activity': 'lightblue'
+}
+
+# Leaflet marker factory for FastMarkerCluster rows of [lat, lng, tooltip]
+FAST_MARKER_CALLBACK = """
+function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.bindTooltip(row[2]);
+    return marker;
+};
+"""
+
+def add_markers(m, points):
+    """Add (lat, lng, title, popup, color) points to a map, clustering large sets"""
+    if len(points) > MARKER_LIMIT:
+        FastMarkerCluster([[lat, lng, title] for lat, lng, title, _, _ in points], callback=FAST_MARKER_CALLBACK).add_to(m)
+        return
+    for lat, lng, title, popup, color in points:
+        folium.Marker([lat, lng], popup=popup, tooltip=title, icon=folium.Icon(color=color)).add_to(m)
+
+def cluster_map(category):
+    """World map rendered from server-side clusters; re-queried as the user pans and zooms"""
+    view = st.session_state.setdefault('cluster_view', {'zoom': 2, 'center': [20.0, 0.0], 'bbox': None})
+    data = api.get_clusters(view['zoom'], view['bbox'], category)
+    m = folium.Map(location=view['center'], zoom_start=view['zoom'])
+    for c in data.get('clusters', []):
+        top = c['top']
+        if c['count'] == 1:
+            folium.Marker([top['lat'], top['lng']], tooltip=top['name'],
+                          popup=f"{top['name']}\n⭐ {top['rating']}\n{top['category']}",
+                          icon=folium.Icon(color=CATEGORY_COLORS.get(top['category'], 'gray'))).add_to(m)
+        else:
+            folium.CircleMarker(
+                [c['lat'], c['lng']], radius=8 + 3 * math.log2(c['count']),
+                color='#3186cc', fill=True, fill_opacity=0.6,
+                tooltip=f"{c['count']} places · top: {top['name']} ⭐ {top['rating']}"
+            ).add_to(m)
+    out = st_folium(m, width=700, height=500, key="cluster_map", returned_objects=["bounds", "zoom", "center"])
+    bounds = (out or {}).get('bounds') or {}
+    if bounds.get('_southWest') and out.get('zoom') is not None:
+        sw, ne = bounds['_southWest'], bounds['_northEast']
+        bbox = ",".join(f"{v:.3f}" for v in (max(sw['lng'], -180), max(sw['lat'], -90), min(ne['lng'], 180), min(ne['lat'], 90)))
+        center = out.get('center') or {'lat': (sw['lat'] + ne['lat']) / 2, 'lng': (sw['lng'] + ne['lng']) / 2}
+        new_view = {'zoom': out['zoom'], 'center': [center['lat'], center['lng']], 'bbox': bbox}
+        if (new_view['zoom'], new_view['bbox']) != (view['zoom'], view['bbox']):
+            st.session_state['cluster_view'] = new_view
+            st.rerun()
+    return data
 
 # Sidebar Navigation
 st.sidebar.title("🧳 Travel Planner")
@@ -112,20 +149,21 @@ if page == "🏠 Home":
     """)
     
     # Quick stats
+    data = api.fetch_concurrently(trips=get_trips, stats=api.get_stats)
+    trips, stats = data['trips'], data['stats']
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        st.metric("Total Trips", len(get_trips()))
+        st.metric("Total Trips", stats.get('trips', len(trips)))
     
     with col2:
-        st.metric("Places Available", len(get_places()))
+        st.metric("Places Available", stats.get('places', 0))
     
     with col3:
-        st.metric("Cities Covered", len(set([p.get('city', '') for p in get_places()])))
+        st.metric("Cities Covered", stats.get('cities', 0))
     
     # Recent trips
     st.subheader("Recent Trips")
-    trips = get_trips()
     if trips:
         for trip in trips[-3:]:  # Show last 3 trips
             with st.expander(f"🎒 {trip['name']} - {trip['destination']}"):
@@ -173,7 +211,8 @@ elif page == "✈️ Plan New Trip":
 
         dry_run = st.checkbox("Preview Only (don't save)", value=True)
         use_google = st.checkbox("Use Google Places (fetch fresh data)", value=False, help="Requires GOOGLE_PLACES_API_KEY in .env")
-        country_mode = st.checkbox("Country Mode (spread across major areas)", value=False, help="Widens search radius; good for country inputs")
+        country_mode = st.checkbox("Country Mode (spread across major areas)", value=False, help="Splits the trip across the country's hub cities, with days allocated by how much matches your interests")
+        weather_aware = st.checkbox("Weather-aware (indoor picks on rainy days)", value=True, help="Requires OPENWEATHER_API_KEY in .env")
         
         submitted = st.form_submit_button("🚀 Generate Itinerary", type="primary")
         
@@ -194,7 +233,8 @@ elif page == "✈️ Plan New Trip":
                     "travelers": travelers,
                     "dry_run": dry_run,
                     "use_google": use_google,
-                    "country_mode": country_mode
+                    "country_mode": country_mode,
+                    "weather_aware": weather_aware
                 }
                 
                 result = create_trip_plan(plan_data)
@@ -219,19 +259,17 @@ elif page == "✈️ Plan New Trip":
                                 
                                 # Add markers for all locations
                                 colors = ['red', 'blue', 'green', 'purple', 'orange', 'darkred', 'lightred']
-                                day_idx = 0
+                                points = []
                                 
-                                for day, items in preview_data['days'].items():
+                                for day_idx, items in enumerate(preview_data['days'].values()):
                                     color = colors[day_idx % len(colors)]
                                     for item in items:
                                         if item.get('lat') and item.get('lng'):
-                                            folium.Marker(
-                                                [item['lat'], item['lng']],
-                                                popup=f"{item['title']}\n{item['start_time']} - {item['end_time']}",
-                                                tooltip=item['title'],
-                                                icon=folium.Icon(color=color)
-                                            ).add_to(m)
-                                    day_idx += 1
+                                            points.append((
+                                                item['lat'], item['lng'], item['title'],
+                                                f"{item['title']}\n{item['start_time']} - {item['end_time']}", color
+                                            ))
+                                add_markers(m, points)
                                 
                                 st_folium(m, width=700, height=400)
                         
@@ -271,7 +309,13 @@ elif page == "📋 My Trips":
     
     if trips:
         # Trip selector
-        trip_names = [f"{trip['name']} - {trip['destination']}" for trip in trips]
+        def trip_label(trip):
+            summary = trip.get('summary') or {}
+            label = f"{trip['name']} - {trip['destination']}"
+            if summary.get('items'):
+                label += f" ({summary['items']} activities, {summary['days']} days, ${summary['total_cost']:.0f})"
+            return label
+        trip_names = [trip_label(trip) for trip in trips]
         selected_trip_idx = st.selectbox("Select a trip", range(len(trips)), format_func=lambda x: trip_names[x])
         
         if selected_trip_idx is not None:
@@ -288,9 +332,8 @@ elif page == "📋 My Trips":
             
             # Get trip plan
             try:
-                response = requests.get(f"{API_BASE}/trips/{trip['id']}/plan")
-                if response.status_code == 200:
-                    plan_data = response.json()
+                plan_data = get_trip_plan(trip['id'])
+                if plan_data is not None:
                     
                     st.subheader("📅 Daily Itinerary")
                     
@@ -332,50 +375,48 @@ elif page == "🗺️ Explore Places":
         if category_filter == "All":
             category_filter = None
         
-        # Get places
-        places = get_places(city_filter if city_filter else None, category_filter)
-        
-        st.subheader(f"Found {len(places)} places")
+        # Without a city the catalog can be huge: browse it through server-side clusters
+        if city_filter:
+            places = get_places(city_filter, category_filter)
+            st.subheader(f"Found {len(places)} places")
+        else:
+            clusters = api.get_clusters(
+                st.session_state.get('cluster_view', {}).get('zoom', 2),
+                st.session_state.get('cluster_view', {}).get('bbox'),
+                category_filter,
+            )
+            places = [c['top'] | {'city': '', 'price_level': None} for c in clusters.get('clusters', [])]
+            places.sort(key=lambda p: -p['rating'])
+            st.subheader(f"Found {clusters.get('total', 0)} places in view")
         
         # Display places list
         for place in places[:10]:  # Show first 10
             with st.expander(f"📍 {place['name']}"):
-                st.write(f"**City:** {place['city']}")
+                if place.get('city'):
+                    st.write(f"**City:** {place['city']}")
                 st.write(f"**Category:** {place['category']}")
                 st.write(f"**Rating:** ⭐ {place['rating']}")
-                st.write(f"**Price Level:** {'💰' * (place['price_level'] + 1)}")
+                if place.get('price_level') is not None:
+                    st.write(f"**Price Level:** {'💰' * (place['price_level'] + 1)}")
                 if place.get('description'):
                     st.write(f"**Description:** {place['description']}")
     
     with col2:
         st.subheader("Map View")
         
-        if places:
+        if not city_filter:
+            cluster_map(category_filter)
+        elif places:
             # Create map centered on first place
             center_lat = places[0]['lat']
             center_lng = places[0]['lng']
             
             m = folium.Map(location=[center_lat, center_lng], zoom_start=12)
-            
-            # Add markers for all places
-            category_colors = {
-                'sights': 'red',
-                'museum': 'blue',
-                'food': 'green',
-                'nature': 'orange',
-                'shopping': 'purple',
-                'nightlife': 'darkred',
-                'activity': 'lightblue'
-            }
-            
-            for place in places:
-                color = category_colors.get(place['category'], 'gray')
-                folium.Marker(
-                    [place['lat'], place['lng']],
-                    popup=f"{place['name']}\n⭐ {place['rating']}\n{place['category']}",
-                    tooltip=place['name'],
-                    icon=folium.Icon(color=color)
-                ).add_to(m)
+            add_markers(m, [
+                (p['lat'], p['lng'], p['name'], f"{p['name']}\n⭐ {p['rating']}\n{p['category']}",
+                 CATEGORY_COLORS.get(p['category'], 'gray'))
+                for p in places
+            ])
             
             st_folium(m, width=700, height=500)
         else:
@@ -430,38 +471,40 @@ elif page == "🌤️ Weather":
     city = st.text_input("Enter city name", placeholder="e.g., Paris")
     
     if city:
-        # Note: This would require actual weather API integration
-        st.info("Weather integration requires API keys. Please add your OpenWeatherMap API key to the .env file.")
-        
-        # Mock weather data for demonstration
-        st.subheader(f"Weather in {city}")
-        
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            st.metric("Temperature", "22°C", "2°C")
-        with col2:
-            st.metric("Humidity", "65%", "-5%")
-        with col3:
-            st.metric("Wind Speed", "15 km/h", "3 km/h")
-        
-        # 5-day forecast (mock data)
-        st.subheader("5-Day Forecast")
-        forecast_data = {
-            'Day': ['Today', 'Tomorrow', 'Day 3', 'Day 4', 'Day 5'],
-            'High': [22, 24, 21, 19, 23],
-            'Low': [15, 17, 14, 12, 16],
-            'Condition': ['Sunny', 'Partly Cloudy', 'Rainy', 'Cloudy', 'Sunny']
-        }
-        
-        df = pd.DataFrame(forecast_data)
-        st.dataframe(df, use_container_width=True)
-        
-        # Temperature chart
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(x=df['Day'], y=df['High'], mode='lines+markers', name='High', line=dict(color='red')))
-        fig.add_trace(go.Scatter(x=df['Day'], y=df['Low'], mode='lines+markers', name='Low', line=dict(color='blue')))
-        fig.update_layout(title='Temperature Forecast', xaxis_title='Day', yaxis_title='Temperature (°C)')
-        st.plotly_chart(fig, use_container_width=True)
+        weather = get_weather(city)
+        if weather is None:
+            st.info("Weather integration requires API keys. Please add your OpenWeatherMap API key to the .env file.")
+        else:
+            st.subheader(f"Weather in {city}")
+            current = weather.get('current') or {}
+            if current:
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Temperature", f"{current['temperature']:.0f}°C")
+                with col2:
+                    st.metric("Humidity", f"{current['humidity']}%")
+                with col3:
+                    # OpenWeather reports m/s in metric units
+                    st.metric("Wind Speed", f"{current['wind_speed'] * 3.6:.0f} km/h")
+                st.caption(current['description'].capitalize())
+
+            daily = weather.get('daily', [])
+            if daily:
+                st.subheader(f"{len(daily)}-Day Forecast")
+                df = pd.DataFrame(daily)
+                df = df[['date', 'high', 'low', 'condition', 'rainy']]
+                df.columns = ['Day', 'High', 'Low', 'Condition', 'Rain Expected']
+                st.dataframe(df, use_container_width=True)
+
+                # Temperature chart
+                fig = go.Figure()
+                fig.add_trace(go.Scatter(x=df['Day'], y=df['High'], mode='lines+markers', name='High', line=dict(color='red')))
+                fig.add_trace(go.Scatter(x=df['Day'], y=df['Low'], mode='lines+markers', name='Low', line=dict(color='blue')))
+                fig.update_layout(title='Temperature Forecast', xaxis_title='Day', yaxis_title='Temperature (°C)')
+                st.plotly_chart(fig, use_container_width=True)
+
+if api.backend_offline():
+    st.sidebar.warning("⚠️ Backend not connected. Some features may not work.")
 
 # Footer
 st.sidebar.markdown("---")
@@ -0,0 +1,13 @@
+from datetime import date, time
+from types import SimpleNamespace
+
+from app.services.export import _ics_lines
+
+def test_ics_long_lines_fold_at_75_octets():
+    title = "Sunset walk along the Promenade des Anglais, then crêpes, café, glaces — " * 3
+    row = SimpleNamespace(id=1, day=date(2026, 5, 4), title=title, type="activity", location_name="Nice",
+                          lat=43.69, lng=7.26, start_time=time(18), end_time=time(20), cost=None, notes=None)
+    text = "".join(_ics_lines("Riviera", [row]))
+    assert all(len(line.encode("utf-8")) <= 75 for line in text.split("\r\n"))
+    summary = next(line for line in text.replace("\r\n ", "").split("\r\n") if line.startswith("SUMMARY:"))
+    assert summary == "SUMMARY:" + title.replace(",", "\\,")
@@ -0,0 +1,29 @@
+import asyncio
+
+import httpx
+
+from app.core.config import settings
+from app.services.google_places import GooglePlacesService
+
+def test_hedged_attempts_each_hold_a_limit_slot(monkeypatch):
+    monkeypatch.setattr(settings, "google_hedge_after_s", 0.02)
+    in_flight, peak = 0, 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.1)
+        in_flight -= 1
+        return httpx.Response(200, json={"status": "OK", "results": []})
+
+    async def main():
+        service = GooglePlacesService(api_key="test")
+        limit = asyncio.Semaphore(1)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            calls = [service._get(client, f"https://places.test/{i}", {}, limit) for i in range(2)]
+            return await asyncio.gather(*calls)
+
+    responses = asyncio.run(main())
+    assert [r.status_code for r in responses] == [200, 200]
+    assert peak == 1
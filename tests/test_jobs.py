@@ -0,0 +1,57 @@
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.models import PlanJob
+from app.services import jobs
+from app.services.jobs import JobQueue
+
+@pytest.fixture(autouse=True)
+def memory_db(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    monkeypatch.setattr(jobs, "engine", engine)
+    return engine
+
+def _wait(queue, job_id, status):
+    for _ in range(200):
+        job = queue.get(job_id)
+        if job.status == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} is {job.status}, expected {status}")
+
+def test_running_job_heartbeats_and_cannot_overwrite_its_successor(memory_db):
+    release = threading.Event()
+    def handler(request, progress):
+        release.wait(5)
+        return {"trip": None}
+    queue = JobQueue(handler, workers=1, max_pending=10, stale_s=0.2)
+    job = queue.submit({})
+    started = _wait(queue, job.id, "running")
+    time.sleep(0.2)
+    assert queue.get(job.id).updated_at > started.updated_at  # heartbeat while the handler blocks
+    with Session(memory_db) as session:  # resumed and claimed again elsewhere
+        session.exec(update(PlanJob).where(PlanJob.id == job.id).values(attempts=PlanJob.attempts + 1))
+        session.commit()
+    release.set()
+    queue._pool.shutdown(wait=True)
+    assert queue.get(job.id).status == "running"
+
+def test_resume_fails_jobs_out_of_attempts(memory_db):
+    queue = JobQueue(lambda request, progress: {}, workers=1, max_pending=10, stale_s=60, max_attempts=2)
+    stale = jobs._now() - timedelta(seconds=120)
+    with Session(memory_db, expire_on_commit=False) as session:
+        spent = PlanJob(request="{}", status="running", attempts=2, updated_at=stale)
+        retry = PlanJob(request="{}", status="running", attempts=1, updated_at=stale)
+        session.add_all([spent, retry])
+        session.commit()
+    assert queue.resume() == 1
+    queue._pool.shutdown(wait=True)
+    assert queue.get(spent.id).status == "failed"
+    assert queue.get(retry.id).status == "done"
@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+
+from app.services.regions import Hub, allocate_regions
+
+HUBS = [Hub("Tokyo", 35.68, 139.69), Hub("Kyoto", 35.01, 135.77), Hub("Osaka", 34.69, 135.50)]
+
+def places(n, rating):
+    return [SimpleNamespace(rating=rating) for _ in range(n)]
+
+def test_days_follow_density():
+    regions = allocate_regions(HUBS, {"Tokyo": places(10, 5.0), "Kyoto": places(2, 4.0), "Osaka": places(2, 4.0)}, 7)
+    days = {r.hub: r.days for r in regions}
+    assert sum(days.values()) == 7
+    assert days["Tokyo"] > days["Kyoto"]
+    assert regions[0].hub == "Tokyo"
+
+def test_zero_density_splits_evenly():
+    regions = allocate_regions(HUBS, {h.name: places(3, 0.0) for h in HUBS}, 7)
+    days = sorted(r.days for r in regions)
+    assert sum(days) == 7
+    assert days[-1] - days[0] <= 1
+
+def test_fewer_days_than_regions_with_zero_density():
+    regions = allocate_regions(HUBS, {h.name: places(3, 0.0) for h in HUBS}, 2)
+    assert [r.days for r in regions] == [1, 1]
+
+def test_density_overrides_capped_pools():
+    # Both pools are capped at the same size; the uncapped density decides the split
+    pools = {h.name: places(4, 4.5) for h in HUBS}
+    regions = allocate_regions(HUBS, pools, 8, density={"Tokyo": 400.0, "Kyoto": 100.0, "Osaka": 100.0})
+    days = {r.hub: r.days for r in regions}
+    assert sum(days.values()) == 8
+    assert days["Tokyo"] > days["Kyoto"] == days["Osaka"]
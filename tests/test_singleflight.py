@@ -0,0 +1,71 @@
+import asyncio
+import threading
+import time
+
+import httpx
+
+from app.core.deadline import deadline
+from app.core.singleflight import SingleFlight
+from app.services import planner
+from app.services.google_places import GooglePlacesService
+
+def test_follower_outlives_leader_timeout():
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return "ok"
+
+    async def main():
+        group = SingleFlight("test")
+        leader = asyncio.ensure_future(asyncio.wait_for(group.do("k", slow), 0.05))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(group.do("k", slow))
+        try:
+            await leader
+        except asyncio.TimeoutError:
+            pass
+        else:
+            raise AssertionError("leader should time out")
+        return await follower
+
+    assert asyncio.run(main()) == "ok"
+    assert calls == [1]
+
+def test_callers_with_different_deadlines_share_slow_upstream():
+    upstream = []
+
+    async def handler(request):
+        upstream.append(request.url.path)
+        await asyncio.sleep(0.3)
+        if request.url.path.endswith("geocode/json"):
+            return httpx.Response(200, json={"results": [{"geometry": {"location": {"lat": 1.0, "lng": 2.0}}}]})
+        return httpx.Response(200, json={"status": "OK", "results": [
+            {"name": "Spot", "types": ["museum"], "geometry": {"location": {"lat": 1.0, "lng": 2.0}}}
+        ]})
+
+    service = GooglePlacesService(api_key="test", transport=httpx.MockTransport(handler))
+    results = {}
+
+    def plan(name, budget_s):
+        try:
+            with deadline(budget_s) as budget:
+                places = planner._run_within_deadline(
+                    service.search_places("Deadline Town", "museum", max_pages=1), "places", [])
+            results[name] = (places, budget.degraded if budget else [])
+        except BaseException as e:  # a leaked CancelledError must fail the test, not the thread
+            results[name] = e
+
+    short = threading.Thread(target=plan, args=("short", planner.FETCH_RESERVE_S + 0.1))
+    unbounded = threading.Thread(target=plan, args=("unbounded", None))
+    short.start()
+    time.sleep(0.05)  # the short-deadline plan leads the shared calls
+    unbounded.start()
+    short.join()
+    unbounded.join()
+
+    assert results["short"] == ([], ["places"])
+    places, degraded = results["unbounded"]
+    assert [p["name"] for p in places] == ["Spot"]
+    assert degraded == []
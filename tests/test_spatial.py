@@ -0,0 +1,27 @@
+import random
+
+from app.services.spatial import PlaceGridIndex
+
+def rows(n, seed=3):
+    rng = random.Random(seed)
+    return [(i, f"P{i}", rng.choice(["food", "museum"]), rng.uniform(-60, 60), rng.uniform(-180, 179.99),
+             round(rng.uniform(3, 5), 1)) for i in range(n)]
+
+def test_bbox_counts_match_brute_force():
+    places = rows(3000)
+    index = PlaceGridIndex.build(places)
+    rng = random.Random(5)
+    for _ in range(50):
+        lng0, lat0 = rng.uniform(-180, 150), rng.uniform(-60, 40)
+        box = (lng0, lat0, lng0 + rng.uniform(0.1, 30), lat0 + rng.uniform(0.1, 20))
+        inside = [p for p in places if box[0] <= p[4] <= box[2] and box[1] <= p[3] <= box[3]]
+        # Base cells are ~150 m, so only places right at the edge may differ
+        got = sum(c["count"] for c in index.clusters(16, box))
+        assert abs(got - len(inside)) <= 2
+
+def test_bbox_across_antimeridian():
+    places = [(1, "East", "food", 0.0, 179.5, 4.0), (2, "West", "food", 0.5, -179.5, 4.5),
+              (3, "Greenwich", "food", 0.0, 0.0, 5.0)]
+    index = PlaceGridIndex.build(places)
+    clusters = index.clusters(10, (179.0, -1.0, -179.0, 1.0))
+    assert sorted(c["top"]["name"] for c in clusters) == ["East", "West"]
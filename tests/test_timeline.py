@@ -0,0 +1,19 @@
+from app.services.timeline import LUNCH_MIN, fit_day
+
+def test_lunch_after_stop_without_lunch_place():
+    slots, lunch = fit_day([120, 120], 9 * 60, 19 * 60, 13 * 60, travel=[[0, 20], [20, 0]])
+    assert lunch == (1, 780, 780 + LUNCH_MIN)
+    assert slots == [(540, 660), (860, 980)]  # afternoon leg timed from the morning stop
+
+def test_lunch_legs_time_both_detours():
+    legs = ([30, 30], [15, 15])  # stop -> lunch place, lunch place -> stop
+    slots, lunch = fit_day([180, 120], 10 * 60, 19 * 60, 13 * 60, travel=[[0, 20], [20, 0]], lunch_legs=legs)
+    assert slots[0] == (600, 780)
+    assert lunch == (1, 810, 810 + LUNCH_MIN)  # walked 30 min to lunch
+    assert slots[1] == (885, 1005)  # and 15 min from it
+
+def test_stop_fitting_only_before_lunch_walks_to_lunch_place():
+    legs = ([25], [25])
+    slots, lunch = fit_day([120], 11 * 60, 19 * 60, 12 * 60, hours=[((660, 780),)], lunch_legs=legs)
+    assert slots == [(660, 780)]
+    assert lunch == (1, 805, 805 + LUNCH_MIN)
@@ -0,0 +1,28 @@
+import asyncio
+import gzip
+import json
+
+import httpx
+
+from app.services.transport import RecordingTransport, fixture_path
+
+def test_recording_decodes_gzip_upstream(tmp_path):
+    payload = {"status": "OK", "results": [{"name": "Louvre"}]}
+
+    def upstream(request):
+        body = gzip.compress(json.dumps(payload).encode("utf-8"))
+        return httpx.Response(200, headers={"Content-Encoding": "gzip", "Content-Type": "application/json"}, content=body)
+
+    transport = RecordingTransport(str(tmp_path), inner=httpx.MockTransport(upstream))
+
+    async def fetch():
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await client.get("https://maps.example.com/place/json", params={"q": "x", "key": "secret"})
+
+    response = asyncio.run(fetch())
+    assert response.json() == payload
+    request = httpx.Request("GET", "https://maps.example.com/place/json", params={"q": "x"})
+    with open(fixture_path(request, str(tmp_path)), encoding="utf-8") as f:
+        fixture = json.load(f)
+    assert fixture["body"] == payload
+    assert "key" not in fixture["request"]["params"]
@@ -0,0 +1,19 @@
+import asyncio
+from datetime import date, datetime, timezone
+
+import httpx
+
+from app.services.weather import WeatherService, rainy_days
+
+def test_forecast_days_follow_destination_timezone():
+    # 2026-05-04 22:00 UTC is already the 5th in Tokyo (UTC+9)
+    dt = int(datetime(2026, 5, 4, 22, tzinfo=timezone.utc).timestamp())
+    body = {"city": {"name": "Tokyo", "timezone": 9 * 3600}, "list": [{
+        "dt": dt, "main": {"temp": 18.0, "humidity": 80},
+        "weather": [{"description": "light rain", "icon": "10d"}], "wind": {"speed": 3.0},
+    }]}
+    service = WeatherService(api_key="test", transport=httpx.MockTransport(lambda request: httpx.Response(200, json=body)))
+    forecast = asyncio.run(service.get_forecast("Tokyo", days=1))
+    slot = forecast["forecasts"][0]["datetime"]
+    assert (slot.date(), slot.hour) == (date(2026, 5, 5), 7)
+    assert rainy_days(forecast, 6, 19) == {date(2026, 5, 5)}